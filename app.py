@@ -40,10 +40,18 @@ with app.app_context():
     # Make sure to import the models here or their tables won't be created
     import models  # noqa: F401
     db.create_all()
+    
+    # Bring existing databases up to date with the models
+    from services.migrations import run_migrations
+    run_migrations()
 
     # Import and register routes
     from routes import init_routes
     init_routes(app)
+    
+    # Report the SQL statements each request runs
+    from utils.query_counter import init_query_counter
+    init_query_counter(app, db.engine)
 
     # Initialize user loader for Flask-Login
     from models import User
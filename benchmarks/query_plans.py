@@ -0,0 +1,142 @@
+"""
+Check that the hot queries are served by an index rather than a table scan
+
+Builds each query the app runs on a hot path, asks the database for its
+plan and fails if any of them scans a whole table. By default a fresh
+temporary SQLite database is migrated and used; pass --database to check a
+real one, e.g. PostgreSQL with production-sized tables. On PostgreSQL
+sequential scans are disabled for the check, so plans show whether an index
+can serve the query even when the tables are small enough that a scan
+would be cheaper.
+
+Usage:
+    python benchmarks/query_plans.py
+    python benchmarks/query_plans.py --database postgresql://localhost/newsnexus --verbose
+"""
+import os
+import sys
+import argparse
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def hot_queries():
+    """Return (name, statement) pairs for the queries on the app's hot paths"""
+    from sqlalchemy import or_, and_, tuple_
+    from app import db
+    from models import Feed, Article, Draft, Newsletter, Subscriber, Job, DeliveryLog
+    
+    user_id, feed_id, newsletter_id = 1, 1, 1
+    now = datetime.utcnow()
+    
+    queries = {
+        'dashboard recent articles': (Article.query.join(Feed)
+                                      .filter(Feed.user_id == user_id)
+                                      .order_by(Article.fetched_at.desc())
+                                      .limit(5)),
+        'articles page after a cursor': (Article.query.join(Feed)
+                                         .filter(Feed.user_id == user_id,
+                                                 tuple_(Article.fetched_at, Article.id) < tuple_(now, 1000))
+                                         .order_by(Article.fetched_at.desc(), Article.id.desc())
+                                         .limit(21)),
+        'articles of a feed': (Article.query
+                               .filter(Article.feed_id == feed_id)
+                               .order_by(Article.fetched_at.desc())
+                               .limit(20)),
+        'existing article URLs': (db.session.query(Article.url)
+                                  .filter(Article.feed_id == feed_id, Article.url.in_(['a', 'b']))),
+        'feeds of a user': Feed.query.filter_by(user_id=user_id).order_by(Feed.created_at.desc()),
+        'due feeds': (db.session.query(Feed.id)
+                      .filter(or_(Feed.next_fetch_at.is_(None), Feed.next_fetch_at <= now))
+                      .order_by(Feed.next_fetch_at)
+                      .limit(100)),
+        'drafts of a user': Draft.query.filter_by(user_id=user_id).order_by(Draft.updated_at.desc()),
+        'newsletters of a user': Newsletter.query.filter_by(user_id=user_id).order_by(Newsletter.created_at.desc()),
+        'due newsletters': (db.session.query(Newsletter.id, Newsletter.user_id)
+                            .filter(Newsletter.status == 'scheduled', Newsletter.scheduled_for <= now)
+                            .order_by(Newsletter.scheduled_for)
+                            .limit(100)),
+        'active subscribers page': (db.session.query(Subscriber.id, Subscriber.email, Subscriber.name)
+                                    .filter_by(user_id=user_id, is_active=True)
+                                    .filter(Subscriber.id > 0)
+                                    .order_by(Subscriber.id)
+                                    .limit(5000)),
+        'subscribers page after a cursor': (Subscriber.query
+                                            .filter(Subscriber.user_id == user_id,
+                                                    tuple_(Subscriber.created_at, Subscriber.id) < tuple_(now, 1000))
+                                            .order_by(Subscriber.created_at.desc(), Subscriber.id.desc())
+                                            .limit(51)),
+        'subscriber by email': Subscriber.query.filter_by(email='a@example.com', user_id=user_id),
+        'job claim': (Job.query
+                      .filter(or_(and_(Job.status == 'queued', Job.run_after <= now),
+                                  and_(Job.status == 'running', Job.locked_at < now)))
+                      .order_by(Job.priority.desc(), Job.run_after, Job.id)
+                      .limit(1)),
+        'jobs of a user': Job.query.filter_by(user_id=user_id).order_by(Job.created_at.desc()).limit(20),
+        'delivered subscribers': (db.session.query(DeliveryLog.subscriber_id)
+                                  .filter(DeliveryLog.newsletter_id == newsletter_id, DeliveryLog.status == 'sent')),
+    }
+    
+    return [(name, query.statement) for name, query in queries.items()]
+
+
+def explain(connection, statement):
+    """Return the plan lines for a statement and whether any of them is a full table scan"""
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+        lines = [row[-1] for row in rows]
+        # "SCAN article" reads the whole table; "SCAN article USING INDEX ..." walks an index in order
+        full_scan = any(line.startswith('SCAN ') and ' USING ' not in line for line in lines)
+    else:
+        rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", params).all()
+        lines = [row[0] for row in rows]
+        full_scan = any('Seq Scan' in line for line in lines)
+    
+    return lines, full_scan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that hot queries use indexes")
+    parser.add_argument('--database', help="database URL to check (defaults to a fresh temporary SQLite database)")
+    parser.add_argument('--verbose', action='store_true', help="print every plan, not just the failing ones")
+    args = parser.parse_args()
+    
+    os.environ['DATABASE_URL'] = args.database or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'plans.db')}"
+    sys.path.insert(0, ROOT)
+    
+    import logging
+    logging.disable(logging.WARNING)
+    
+    from app import app, db
+    
+    failures = 0
+    
+    with app.app_context():
+        connection = db.session.connection()
+        if connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql("SET enable_seqscan = off")
+        
+        for name, statement in hot_queries():
+            lines, full_scan = explain(connection, statement)
+            failures += full_scan
+            
+            print(f"{'FAIL' if full_scan else 'ok':<5} {name}")
+            if full_scan or args.verbose:
+                for line in lines:
+                    print(f"        {line}")
+        
+        db.session.rollback()
+    
+    if failures:
+        sys.exit(f"{failures} hot queries scan a whole table")
+
+
+if __name__ == '__main__':
+    main()
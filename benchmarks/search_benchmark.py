@@ -0,0 +1,159 @@
+"""
+Benchmark article full-text search on a large synthetic corpus
+
+Generates articles whose words follow a Zipf distribution over a news-sized
+vocabulary (the words of benchmarks/articles.json, most frequent first,
+padded with made-up words) and spreads them over several users.
+They are inserted the way the scraper inserts them, so the search index is
+maintained as they go in. It then times search_articles for queries made
+of one to three words taken from the searching user's own articles, and
+reports latency percentiles. A temporary SQLite database is used unless
+--database points elsewhere (use an empty database; the benchmark adds its
+own users).
+
+Usage:
+    python benchmarks/search_benchmark.py
+    python benchmarks/search_benchmark.py --articles 200000 --queries 500
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'articles.json')
+SYLLABLES = ['ba', 'ce', 'di', 'fo', 'gu', 'ka', 'le', 'mi', 'no', 'pu', 'ra', 'se', 'ti', 'vo', 'zu',
+             'bran', 'cort', 'dex', 'fel', 'gran', 'hol', 'jen', 'kis', 'lom', 'mar', 'nel', 'pol', 'quin', 'rust',
+             'sten', 'tor', 'vel', 'wex', 'yor', 'zan']
+
+
+def build_vocabulary(size, rng):
+    """The benchmark corpus's words, most frequent first, padded with made-up words to `size` words"""
+    with open(CORPUS) as f:
+        articles = json.load(f)
+    
+    counts = {}
+    for article in articles:
+        for word in re.findall(r"[a-z]+", f"{article['title']} {article['content']}".lower()):
+            counts[word] = counts.get(word, 0) + 1
+    
+    vocabulary = sorted(counts, key=counts.get, reverse=True)
+    known = set(vocabulary)
+    
+    while len(vocabulary) < size:
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in known:
+            known.add(word)
+            vocabulary.append(word)
+    
+    return vocabulary[:size]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark article full-text search")
+    parser.add_argument('--database', help="database URL (defaults to a fresh temporary SQLite database)")
+    parser.add_argument('--articles', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10, help="users the articles are spread over")
+    parser.add_argument('--words', type=int, default=80, help="words of content per article")
+    parser.add_argument('--vocabulary', type=int, default=50000, help="distinct words in the corpus")
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    
+    os.environ['DATABASE_URL'] = args.database or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}"
+    sys.path.insert(0, ROOT)
+    
+    import logging
+    logging.disable(logging.WARNING)
+    
+    from sqlalchemy import insert
+    from app import app, db
+    from models import User, Feed, Article
+    from services.search import search_articles
+    
+    rng = random.Random(args.seed)
+    vocabulary = build_vocabulary(args.vocabulary, rng)
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(vocabulary) + 1):
+        total += 1 / rank
+        cum_weights.append(total)
+    
+    def words(k):
+        return rng.choices(vocabulary, cum_weights=cum_weights, k=k)
+    
+    with app.app_context():
+        users = [User(username=f"search-benchmark-{i}", email=f"search-benchmark-{i}@example.com", password_hash='-')
+                 for i in range(args.users)]
+        db.session.add_all(users)
+        db.session.flush()
+        
+        feeds = [Feed(name=f"Feed {i}", url=f"https://example.com/{i}.xml", type='rss', user_id=users[i % args.users].id)
+                 for i in range(args.users * 20)]
+        db.session.add_all(feeds)
+        db.session.commit()
+        feed_ids = [feed.id for feed in feeds]
+        
+        print(f"Inserting {args.articles} articles...", file=sys.stderr)
+        started = time.monotonic()
+        fetched_at = datetime(2024, 1, 1)
+        chunk_size = 10000
+        
+        for start in range(0, args.articles, chunk_size):
+            rows = []
+            for i in range(start, min(start + chunk_size, args.articles)):
+                rows.append({
+                    'title': ' '.join(words(rng.randint(5, 10))).capitalize(),
+                    'url': f"https://example.com/article/{i}",
+                    'content': ' '.join(words(args.words)),
+                    'fetched_at': fetched_at + timedelta(seconds=i),
+                    'feed_id': feed_ids[i % len(feed_ids)],
+                    'used_in_draft': False,
+                })
+            db.session.execute(insert(Article), rows)
+            db.session.commit()
+        
+        insert_seconds = time.monotonic() - started
+        
+        # Queries are words from the searching user's own titles, as if looking for a story seen before
+        user_id = users[0].id
+        titles = [title for (title,) in (db.session.query(Article.title)
+                                         .join(Feed)
+                                         .filter(Feed.user_id == user_id)
+                                         .order_by(db.func.random())
+                                         .limit(args.queries))]
+        queries = [' '.join(rng.sample(title.lower().split(), min(rng.randint(1, 3), len(title.split()))))
+                   for title in titles]
+        
+        search_articles(user_id, queries[0])  # warm up
+        
+        timings = []
+        found = 0
+        for query in queries:
+            started = time.monotonic()
+            results, _, _ = search_articles(user_id, query)
+            timings.append((time.monotonic() - started) * 1000)
+            found += bool(results)
+        
+        db.session.rollback()
+    
+    print(f"articles: {args.articles} over {args.users} users, inserted in {insert_seconds:.1f}s "
+          f"({args.articles / insert_seconds:.0f}/s)")
+    print(f"queries:  {len(queries)}, {found} with results")
+    print(f"latency:  p50 {percentile(timings, 0.5):.1f} ms, p95 {percentile(timings, 0.95):.1f} ms, "
+          f"p99 {percentile(timings, 0.99):.1f} ms, max {max(timings):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Load-test the newsletter send path against local stand-in servers
+
+Runs the full deliver_newsletter path (Markdown rendering, subscriber
+streaming, batching, the email transport and delivery logging) for a
+generated subscriber list and reports messages per second. SendGrid is
+replaced by a local HTTP server, SMTP by a local sink that accepts and
+counts messages, and the file transport writes to a temporary file, so
+nothing leaves the machine. Each transport runs in its own process with a
+fresh temporary SQLite database.
+
+--fail-after makes the SMTP sink answer one message with a 451 reply
+partway through a batch, to check that the recipients delivered before
+it are not sent to again when the batch is retried. The duplicates column
+counts recipients that received the newsletter more than once, and the
+run exits non-zero if any did.
+
+Usage:
+    python benchmarks/send_load_test.py
+    python benchmarks/send_load_test.py --transport smtp --subscribers 100000 --latency 20
+    python benchmarks/send_load_test.py --transport smtp --subscribers 2000 --fail-after 500
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+import socketserver
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'articles.json')
+TRANSPORTS = ['sendgrid', 'smtp', 'file']
+
+
+def start_sendgrid_stand_in(latency, delivered, received):
+    """Serve a local stand-in for the SendGrid mail/send endpoint; returns its port"""
+    lock = threading.Lock()
+    
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+        
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            time.sleep(latency)
+            with lock:
+                delivered[0] += len(body['personalizations'])
+                received.extend(to['email'] for p in body['personalizations'] for to in p['to'])
+            self.send_response(202)
+            self.end_headers()
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+def start_smtp_stand_in(latency, delivered, received, fail_after=None):
+    """
+    Serve a minimal SMTP sink that accepts and counts messages; returns its port
+    
+    With fail_after, the message after the first `fail_after` accepted ones
+    gets a transient 451 reply instead, once.
+    """
+    lock = threading.Lock()
+    failed = [False]
+    
+    class Handler(socketserver.StreamRequestHandler):
+        disable_nagle_algorithm = True
+        
+        def reply(self, line):
+            self.wfile.write(line.encode() + b'\r\n')
+        
+        def handle(self):
+            self.reply('220 localhost ESMTP load-test sink')
+            recipients = []
+            
+            for line in self.rfile:
+                command = line.decode(errors='replace').strip()
+                
+                if command.upper().startswith('EHLO'):
+                    self.wfile.write(b'250-localhost\r\n250 8BITMIME\r\n')
+                elif command.upper().startswith('RCPT'):
+                    recipients.append(command.split(':', 1)[1].strip().strip('<>'))
+                    self.reply('250 OK')
+                elif command.upper().startswith(('MAIL', 'RSET')):
+                    recipients = []
+                    self.reply('250 OK')
+                elif command.upper() == 'DATA':
+                    self.reply('354 End data with <CR><LF>.<CR><LF>')
+                    for data_line in self.rfile:
+                        if data_line in (b'.\r\n', b'.\n'):
+                            break
+                    time.sleep(latency)
+                    with lock:
+                        inject = fail_after is not None and not failed[0] and delivered[0] >= fail_after
+                        if inject:
+                            failed[0] = True
+                        else:
+                            delivered[0] += 1
+                            received.extend(recipients)
+                    self.reply('451 Try again later' if inject else '250 OK')
+                elif command.upper() == 'QUIT':
+                    self.reply('221 Bye')
+                    return
+                else:
+                    # HELO, NOOP
+                    self.reply('250 OK')
+    
+    class Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+    
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+def build_draft_content():
+    """Newsletter Markdown of the shape generate_newsletter_draft produces, from the benchmark corpus"""
+    with open(CORPUS) as f:
+        articles = json.load(f)
+    
+    sections = [f"## {article['title']}\n\n{article['content'][:600]}\n\nRead more: {article['url']}"
+                for article in articles]
+    return "# Load Test Newsletter\n\n" + "\n\n".join(sections)
+
+
+def run_transport(transport, subscribers, latency, batch_size, workers, fail_after=None):
+    """Send one newsletter through `transport` in this process and print the results as JSON"""
+    delivered = [0]
+    received = []
+    workdir = tempfile.mkdtemp(prefix='send-load-test-')
+    
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'load_test.db')}",
+        'EMAIL_TRANSPORT': transport,
+        'SENDGRID_RATE_LIMIT': '0',
+        'SENDGRID_BATCH_SIZE': str(batch_size),
+        'SENDGRID_MAX_WORKERS': str(workers),
+        'SMTP_POOL_SIZE': str(workers),
+        'SMTP_USE_TLS': '0',
+        'EMAIL_FILE_PATH': os.path.join(workdir, 'outbox.jsonl'),
+    })
+    
+    if transport == 'sendgrid':
+        os.environ['SENDGRID_API_HOST'] = f"http://127.0.0.1:{start_sendgrid_stand_in(latency, delivered, received)}"
+    elif transport == 'smtp':
+        os.environ['SMTP_HOST'] = '127.0.0.1'
+        os.environ['SMTP_PORT'] = str(start_smtp_stand_in(latency, delivered, received, fail_after))
+    
+    sys.path.insert(0, ROOT)
+    
+    import logging
+    from app import app, db
+    from models import User, Subscriber, Draft, Newsletter, DeliveryLog
+    from services.tasks import deliver_newsletter
+    
+    logging.disable(logging.WARNING)
+    
+    with app.app_context():
+        user = User(username='load-test', email='load-test@example.com', password_hash='-',
+                    sendgrid_api_key='load-test')
+        db.session.add(user)
+        db.session.commit()
+        
+        db.session.bulk_insert_mappings(Subscriber, [
+            {'email': f"subscriber{i}@example.com", 'name': f"Subscriber {i}", 'user_id': user.id, 'is_active': True}
+            for i in range(subscribers)
+        ])
+        
+        draft = Draft(title='Load Test Newsletter', content=build_draft_content(), user_id=user.id)
+        db.session.add(draft)
+        db.session.commit()
+        
+        newsletter = Newsletter(subject='Load Test Newsletter', user_id=user.id, draft_id=draft.id, status='sending')
+        db.session.add(newsletter)
+        db.session.commit()
+        
+        started = time.monotonic()
+        success, error = deliver_newsletter(newsletter)
+        elapsed = time.monotonic() - started
+        
+        logged = DeliveryLog.query.filter_by(newsletter_id=newsletter.id, status='sent').count()
+    
+    if transport == 'file':
+        with open(os.environ['EMAIL_FILE_PATH']) as outbox:
+            for line in outbox:
+                personalizations = json.loads(line)['message']['personalizations']
+                delivered[0] += len(personalizations)
+                received.extend(to['email'] for p in personalizations for to in p['to'])
+    
+    print(json.dumps({
+        'success': success,
+        'error': error,
+        'seconds': elapsed,
+        'messages_per_second': delivered[0] / elapsed if elapsed > 0 else 0.0,
+        'delivered': delivered[0],
+        'duplicates': len(received) - len(set(received)),
+        'logged': logged,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the newsletter send path")
+    parser.add_argument('--transport', action='append', dest='transports', choices=TRANSPORTS,
+                        help="transport to test (repeatable, defaults to all)")
+    parser.add_argument('--subscribers', type=int, default=20000)
+    parser.add_argument('--latency', type=float, default=0,
+                        help="milliseconds the stand-in servers wait per request (SendGrid) or message (SMTP)")
+    parser.add_argument('--batch-size', type=int, default=1000, help="recipients per transport call")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent transport calls")
+    parser.add_argument('--fail-after', type=int,
+                        help="SMTP sink answers 451 once after accepting this many messages")
+    parser.add_argument('--run', choices=TRANSPORTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.run:
+        run_transport(args.run, args.subscribers, args.latency / 1000, args.batch_size, args.workers,
+                      args.fail_after)
+        return
+    
+    print(f"{'transport':<10} {'subscribers':>11} {'seconds':>8} {'messages/s':>11} {'delivered':>10} "
+          f"{'duplicates':>10} {'logged':>8}")
+    duplicated = False
+    
+    for transport in args.transports or TRANSPORTS:
+        command = [sys.executable, os.path.abspath(__file__), '--run', transport,
+                   '--subscribers', str(args.subscribers), '--latency', str(args.latency),
+                   '--batch-size', str(args.batch_size), '--workers', str(args.workers)]
+        if args.fail_after is not None:
+            command += ['--fail-after', str(args.fail_after)]
+        
+        process = subprocess.run(command, capture_output=True, text=True)
+        
+        if process.returncode != 0:
+            print(f"{transport:<10} failed: {process.stderr.strip().splitlines()[-1] if process.stderr.strip() else process.returncode}")
+            continue
+        
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        duplicated = duplicated or result['duplicates'] > 0
+        print(f"{transport:<10} {args.subscribers:>11} {result['seconds']:>8.2f} {result['messages_per_second']:>11.0f} "
+              f"{result['delivered']:>10} {result['duplicates']:>10} {result['logged']:>8}"
+              + ("" if result['success'] else f"  {result['error']}"))
+    
+    if duplicated:
+        sys.exit("Some recipients received the newsletter more than once")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark local summarizer backends on a fixed article corpus
+
+Each configuration runs in its own process, so load time and peak RSS are
+measured in isolation. Output quality is reported as ROUGE-L F1 against the
+summaries of the first configuration (the current torch path by default).
+The summary cache is disabled and an in-memory database is used, so the
+benchmark never touches application data.
+
+Usage:
+    python benchmarks/summarizer_benchmark.py
+    python benchmarks/summarizer_benchmark.py --config torch --config int8 \\
+        --config torch:sshleifer/distilbart-cnn-12-6 --config onnx --repeat 3
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'articles.json')
+DEFAULT_CONFIGS = ['torch', 'int8', 'torch:sshleifer/distilbart-cnn-12-6']
+
+
+def load_corpus(path):
+    """Load the corpus as texts formatted the way summarize_articles formats them"""
+    with open(path) as f:
+        articles = json.load(f)
+    
+    return [
+        f"Title: {article['title']}\nSource: {article['url']}\n\nContent: {article['content'][:1000]}"
+        for article in articles
+    ]
+
+
+def run_config(backend, model_name, corpus_path, batch_size, repeat):
+    """Benchmark one backend/model in this process and print the results as JSON"""
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    os.environ['SUMMARY_CACHE_ENABLED'] = '0'
+    sys.path.insert(0, ROOT)
+    
+    import logging
+    from app import app
+    from services.ai_generator import load_local_summarizer, summarize_texts_local
+    
+    logging.disable(logging.INFO)
+    texts = load_corpus(corpus_path)
+    
+    with app.app_context():
+        started = time.monotonic()
+        summarizer = load_local_summarizer(model_name, backend)
+        load_seconds = time.monotonic() - started
+        
+        # Warm up so one-off initialisation isn't counted
+        summarize_texts_local(summarizer, texts[:1], batch_size=batch_size)
+        
+        timings = []
+        for _ in range(repeat):
+            started = time.monotonic()
+            summaries = summarize_texts_local(summarizer, texts, batch_size=batch_size)
+            timings.append(time.monotonic() - started)
+    
+    best = min(timings)
+    print(json.dumps({
+        'load_seconds': load_seconds,
+        'seconds': best,
+        'ms_per_article': best * 1000 / len(texts),
+        'articles_per_second': len(texts) / best if best > 0 else 0.0,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'summaries': summaries,
+    }))
+
+
+def rouge_l(candidate, reference):
+    """ROUGE-L F1 between two texts, over lowercased word tokens"""
+    a = re.findall(r"\w+", candidate.lower())
+    b = re.findall(r"\w+", reference.lower())
+    
+    if not a or not b:
+        return 0.0
+    
+    # Longest common subsequence, one row at a time
+    previous = [0] * (len(b) + 1)
+    for token in a:
+        current = [0]
+        for j, other in enumerate(b):
+            current.append(previous[j] + 1 if token == other else max(previous[j + 1], current[j]))
+        previous = current
+    
+    lcs = previous[-1]
+    if not lcs:
+        return 0.0
+    
+    precision = lcs / len(a)
+    recall = lcs / len(b)
+    return 2 * precision * recall / (precision + recall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local summarizer backends")
+    parser.add_argument('--config', action='append', dest='configs',
+                        help="backend[:model], e.g. int8 or torch:sshleifer/distilbart-cnn-12-6 (repeatable; "
+                             "the first is the quality baseline)")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help="JSON list of articles with title, url and content")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=1, help="timed runs per configuration (the best is reported)")
+    parser.add_argument('--output', help="also write the full results, including summaries, to this JSON file")
+    parser.add_argument('--run', nargs=2, metavar=('BACKEND', 'MODEL'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.run:
+        run_config(args.run[0], args.run[1], args.corpus, args.batch_size, args.repeat)
+        return
+    
+    results = []
+    
+    for config in args.configs or DEFAULT_CONFIGS:
+        backend, _, model_name = config.partition(':')
+        model_name = model_name or 'facebook/bart-large-cnn'
+        print(f"Running {backend} {model_name}...", file=sys.stderr)
+        
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run', backend, model_name, '--corpus', args.corpus,
+             '--batch-size', str(args.batch_size), '--repeat', str(args.repeat)],
+            capture_output=True, text=True
+        )
+        
+        if process.returncode != 0:
+            print(f"  failed: {process.stderr.strip().splitlines()[-1] if process.stderr.strip() else process.returncode}",
+                  file=sys.stderr)
+            continue
+        
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        result.update(backend=backend, model=model_name)
+        results.append(result)
+    
+    if not results:
+        sys.exit("No configuration completed")
+    
+    baseline = results[0]['summaries']
+    for result in results:
+        scores = [rouge_l(summary, reference) for summary, reference in zip(result['summaries'], baseline)]
+        result['rouge_l'] = sum(scores) / len(scores)
+    
+    print(f"{'backend':<8} {'model':<40} {'load s':>7} {'ms/article':>11} {'articles/s':>11} {'peak RSS MB':>12} {'ROUGE-L':>8}")
+    for result in results:
+        print(f"{result['backend']:<8} {result['model']:<40} {result['load_seconds']:>7.1f} "
+              f"{result['ms_per_article']:>11.1f} {result['articles_per_second']:>11.2f} "
+              f"{result['peak_rss_mb']:>12.0f} {result['rouge_l']:>8.3f}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
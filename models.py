@@ -23,6 +23,11 @@ class User(UserMixin, db.Model):
 
 
 class Feed(db.Model):
+    __table_args__ = (
+        db.Index('ix_feed_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_feed_next_fetch_at', 'next_fetch_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
     url = db.Column(db.String(512), nullable=False)
@@ -31,15 +36,40 @@ class Feed(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
+    # HTTP cache validators from the last successful fetch
+    etag = db.Column(db.String(256))
+    last_modified = db.Column(db.String(64))
+    content_hash = db.Column(db.String(64))  # sha256 of the last downloaded body
+    latest_entry_url = db.Column(db.String(512))  # newest entry at the last fetch, where streaming parses stop
+    
+    # Adaptive refresh schedule
+    next_fetch_at = db.Column(db.DateTime, default=datetime.utcnow)
+    fetch_interval = db.Column(db.Integer)  # seconds, adapted to the feed's publish rate
+    fetch_failures = db.Column(db.Integer, default=0)  # consecutive failed fetches
+    
     # Relationships
     articles = db.relationship('Article', backref='feed', lazy=True, cascade="all, delete-orphan")
 
 
 class Article(db.Model):
+    __table_args__ = (
+        db.Index('ix_article_feed_id_url', 'feed_id', 'url', unique=True),
+        db.Index('ix_article_feed_id_fetched_at', 'feed_id', 'fetched_at'),
+        db.Index('ix_article_fetched_at_id', 'fetched_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(256), nullable=False)
     url = db.Column(db.String(512), nullable=False)
     content = db.Column(db.Text)
+    summary = db.Column(db.Text)  # Filled in at ingestion when pre-summarization is enabled
+    summary_tier = db.Column(db.String(32))  # SUMMARY_TIERS entry that produced the summary
+    
+    # Computed from content at ingestion, so list views can leave content unloaded
+    snippet = db.Column(db.String(320))
+    word_count = db.Column(db.Integer)
+    reading_time = db.Column(db.Integer)  # minutes
+    
     published_at = db.Column(db.DateTime)
     fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
     feed_id = db.Column(db.Integer, db.ForeignKey('feed.id'), nullable=False)
@@ -47,6 +77,10 @@ class Article(db.Model):
 
 
 class Draft(db.Model):
+    __table_args__ = (
+        db.Index('ix_draft_user_id_updated_at', 'user_id', 'updated_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(256), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -61,6 +95,11 @@ class Draft(db.Model):
 
 
 class Newsletter(db.Model):
+    __table_args__ = (
+        db.Index('ix_newsletter_status_scheduled_for', 'status', 'scheduled_for'),
+        db.Index('ix_newsletter_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     subject = db.Column(db.String(256), nullable=False)
     scheduled_for = db.Column(db.DateTime)
@@ -68,17 +107,107 @@ class Newsletter(db.Model):
     recipient_count = db.Column(db.Integer, default=0)
     open_count = db.Column(db.Integer, default=0)
     click_count = db.Column(db.Integer, default=0)
-    status = db.Column(db.String(32), default='scheduled')  # scheduled, sending, sent, failed
+    status = db.Column(db.String(32), default='scheduled')  # scheduled, sending, retrying, sent, failed
     error_message = db.Column(db.Text)
+    send_job_id = db.Column(db.Integer)  # Job that owns sending this newsletter
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     draft_id = db.Column(db.Integer, db.ForeignKey('draft.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
 class Subscriber(db.Model):
+    __table_args__ = (
+        db.Index('ix_subscriber_user_id_is_active_id', 'user_id', 'is_active', 'id'),
+        db.Index('ix_subscriber_user_id_email', 'user_id', 'email'),
+        db.Index('ix_subscriber_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), nullable=False)
     name = db.Column(db.String(128))
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+
+class Job(db.Model):
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+        db.Index('ix_job_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(64), nullable=False)  # fetch_feeds, generate_draft, send_newsletter
+    payload = db.Column(db.JSON, default=dict)
+    status = db.Column(db.String(32), default='queued')  # queued, running, succeeded, failed
+    priority = db.Column(db.Integer, default=0)  # Higher runs first
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_by = db.Column(db.String(128))
+    locked_at = db.Column(db.DateTime)
+    result = db.Column(db.JSON)
+    error_message = db.Column(db.Text)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'priority': self.priority,
+            'result': self.result,
+            'error': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class SummaryCache(db.Model):
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of (model, parameters, truncated input)
+    model = db.Column(db.String(256), nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    inference_ms = db.Column(db.Integer, default=0)  # time it took to compute the summary
+    hits = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class DeliveryLog(db.Model):
+    __table_args__ = (
+        db.Index('ix_delivery_log_newsletter_subscriber', 'newsletter_id', 'subscriber_id', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    newsletter_id = db.Column(db.Integer, db.ForeignKey('newsletter.id', ondelete='CASCADE'), nullable=False)
+    subscriber_id = db.Column(db.Integer, db.ForeignKey('subscriber.id', ondelete='CASCADE'), nullable=False)
+    batch = db.Column(db.Integer, nullable=False)  # SendGrid request the recipient was part of
+    status = db.Column(db.String(32), nullable=False)  # sent, failed
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SchemaMigration(db.Model):
+    # One row per migration in services.migrations that has been applied to this database
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(256), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class UserStats(db.Model):
+    # Dashboard rollup, kept current by services.user_stats as feeds, articles, drafts and newsletters change
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    feed_count = db.Column(db.Integer, nullable=False, default=0)
+    article_count = db.Column(db.Integer, nullable=False, default=0)
+    draft_count = db.Column(db.Integer, nullable=False, default=0)
+    newsletter_count = db.Column(db.Integer, nullable=False, default=0)
+    sent_count = db.Column(db.Integer, nullable=False, default=0)
+    total_recipients = db.Column(db.Integer, nullable=False, default=0)  # summed over sent newsletters
+    total_opens = db.Column(db.Integer, nullable=False, default=0)
+    total_clicks = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)  # last full recount
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
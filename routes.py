@@ -1,16 +1,25 @@
+import os
 import logging
 from flask import render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import defer, contains_eager
 from app import db
-from models import User, Feed, Article, Draft, Newsletter, Subscriber
-from services.scraper import fetch_rss_feed, fetch_website_content
+from models import User, Feed, Article, Draft, Newsletter, Subscriber, Job, DeliveryLog
 from services.notion_client import save_to_notion, get_from_notion
-from services.ai_generator import generate_newsletter_draft
-from services.email_sender import send_newsletter
 from services.telegram_notifier import send_notification
-from utils.helpers import format_date, truncate_text, get_reading_time
+from services.job_queue import enqueue_job
+from services.scheduler import claim_due_newsletters
+from services.tasks import queue_newsletter_send
+from services.summary_cache import get_summary_cache_stats
+from services.ai_generator import SUMMARY_TIERS
+from services.email_sender import render_newsletter
+from services.user_stats import get_user_stats, bump_user_stats
+from services.search import search_articles, SEARCH_MAX_CANDIDATES
+from utils.helpers import format_date, truncate_text
+from utils.pagination import keyset_paginate
 
 logger = logging.getLogger(__name__)
 
@@ -83,15 +92,13 @@ def init_routes(app):
     @app.route('/dashboard')
     @login_required
     def dashboard():
-        # Get counts for dashboard
-        feed_count = Feed.query.filter_by(user_id=current_user.id).count()
-        article_count = Article.query.join(Feed).filter(Feed.user_id == current_user.id).count()
-        draft_count = Draft.query.filter_by(user_id=current_user.id).count()
-        newsletter_count = Newsletter.query.filter_by(user_id=current_user.id).count()
+        # Counts and engagement totals come from the incrementally maintained rollup row
+        stats = get_user_stats(current_user.id)
         
         # Get recent items
         recent_articles = (Article.query
                            .join(Feed)
+                           .options(defer(Article.content), contains_eager(Article.feed))
                            .filter(Feed.user_id == current_user.id)
                            .order_by(Article.fetched_at.desc())
                            .limit(5)
@@ -117,25 +124,17 @@ def init_routes(app):
                                 .limit(3)
                                 .all())
         
-        # Get statistics for engagement
-        sent_newsletters = Newsletter.query.filter(
-            Newsletter.user_id == current_user.id,
-            Newsletter.status == 'sent'
-        ).all()
-        
-        total_recipients = sum(n.recipient_count for n in sent_newsletters) if sent_newsletters else 0
-        total_opens = sum(n.open_count for n in sent_newsletters) if sent_newsletters else 0
-        total_clicks = sum(n.click_count for n in sent_newsletters) if sent_newsletters else 0
-        
-        open_rate = (total_opens / total_recipients * 100) if total_recipients > 0 else 0
-        click_rate = (total_clicks / total_recipients * 100) if total_recipients > 0 else 0
+        # Engagement statistics
+        total_recipients = stats.total_recipients
+        open_rate = (stats.total_opens / total_recipients * 100) if total_recipients > 0 else 0
+        click_rate = (stats.total_clicks / total_recipients * 100) if total_recipients > 0 else 0
         
         return render_template(
             'dashboard.html',
-            feed_count=feed_count,
-            article_count=article_count,
-            draft_count=draft_count,
-            newsletter_count=newsletter_count,
+            feed_count=stats.feed_count,
+            article_count=stats.article_count,
+            draft_count=stats.draft_count,
+            newsletter_count=stats.newsletter_count,
             recent_articles=recent_articles,
             recent_drafts=recent_drafts,
             recent_newsletters=recent_newsletters,
@@ -173,33 +172,23 @@ def init_routes(app):
         )
         
         db.session.add(new_feed)
+        bump_user_stats(current_user.id, feed_count=1)
         db.session.commit()
         
-        # Try to fetch content immediately
-        try:
-            if feed_type == 'rss':
-                articles = fetch_rss_feed(new_feed)
-            else:
-                articles = fetch_website_content(new_feed)
-                
-            if articles:
-                new_feed.last_fetched = datetime.utcnow()
-                db.session.commit()
-                flash(f'Successfully added feed and fetched {len(articles)} articles', 'success')
-            else:
-                flash('Added feed but could not fetch articles', 'warning')
-        except Exception as e:
-            logger.error(f"Error fetching feed content: {str(e)}")
-            flash(f'Added feed but error fetching content: {str(e)}', 'warning')
+        # Fetch content in the background
+        enqueue_job('fetch_feeds', {'feed_ids': [new_feed.id]}, user_id=current_user.id)
         
+        flash('Feed added; articles are being fetched in the background', 'success')
         return redirect(url_for('feeds'))
     
     @app.route('/feeds/<int:feed_id>/delete', methods=['POST'])
     @login_required
     def delete_feed(feed_id):
         feed = Feed.query.filter_by(id=feed_id, user_id=current_user.id).first_or_404()
+        article_count = Article.query.filter_by(feed_id=feed.id).count()
         
         db.session.delete(feed)
+        bump_user_stats(current_user.id, feed_count=-1, article_count=-article_count)
         db.session.commit()
         
         flash('Feed deleted successfully', 'success')
@@ -210,34 +199,35 @@ def init_routes(app):
     def fetch_feed(feed_id):
         feed = Feed.query.filter_by(id=feed_id, user_id=current_user.id).first_or_404()
         
-        try:
-            if feed.type == 'rss':
-                articles = fetch_rss_feed(feed)
-            else:
-                articles = fetch_website_content(feed)
-                
-            if articles:
-                feed.last_fetched = datetime.utcnow()
-                db.session.commit()
-                flash(f'Successfully fetched {len(articles)} articles', 'success')
-            else:
-                flash('No new articles found', 'info')
-        except Exception as e:
-            logger.error(f"Error fetching feed content: {str(e)}")
-            flash(f'Error fetching content: {str(e)}', 'danger')
+        enqueue_job('fetch_feeds', {'feed_ids': [feed.id]}, user_id=current_user.id)
         
+        flash('Fetching articles in the background', 'info')
+        return redirect(url_for('feeds'))
+    
+    @app.route('/feeds/fetch-all', methods=['POST'])
+    @login_required
+    def fetch_all_feeds():
+        feed_ids = [feed_id for (feed_id,) in db.session.query(Feed.id).filter_by(user_id=current_user.id)]
+        
+        if not feed_ids:
+            flash('You have no content sources to fetch', 'warning')
+            return redirect(url_for('feeds'))
+        
+        enqueue_job('fetch_feeds', {'feed_ids': feed_ids}, user_id=current_user.id)
+        
+        flash(f'Fetching {len(feed_ids)} sources in the background', 'info')
         return redirect(url_for('feeds'))
     
     @app.route('/articles')
     @login_required
     def articles():
-        page = request.args.get('page', 1, type=int)
         per_page = 20
         
+        # List pages show the precomputed snippet and reading time, so the full text stays in the database
         articles_query = (Article.query
                          .join(Feed)
-                         .filter(Feed.user_id == current_user.id)
-                         .order_by(Article.fetched_at.desc()))
+                         .options(defer(Article.content), contains_eager(Article.feed))
+                         .filter(Feed.user_id == current_user.id))
         
         # Filter options
         feed_id = request.args.get('feed_id', type=int)
@@ -248,28 +238,69 @@ def init_routes(app):
         if unused_only:
             articles_query = articles_query.filter(Article.used_in_draft == False)
             
-        pagination = articles_query.paginate(page=page, per_page=per_page)
+        search_query = request.args.get('q', '').strip()
+        search_page = max(request.args.get('page', 1, type=int), 1)
+        search_has_more = False
+        search_capped = False
+        pagination = None
+        
+        if search_query:
+            # Full-text matches are ranked by relevance and paged by number
+            articles, search_has_more, search_capped = search_articles(
+                current_user.id,
+                search_query,
+                feed_id=feed_id,
+                unused_only=unused_only,
+                limit=per_page,
+                offset=(search_page - 1) * per_page
+            )
+        else:
+            # The rollup's count is only shown for the unfiltered list, so no COUNT query is needed
+            total = None if feed_id or unused_only else get_user_stats(current_user.id).article_count
+            
+            pagination = keyset_paginate(
+                articles_query,
+                (Article.fetched_at, Article.id),
+                per_page=per_page,
+                after=request.args.get('after'),
+                before=request.args.get('before'),
+                total=total
+            )
+            articles = pagination.items
         
         feeds = Feed.query.filter_by(user_id=current_user.id).all()
         
         return render_template(
             'articles.html', 
-            articles=pagination.items,
+            articles=articles,
             pagination=pagination,
+            search_query=search_query,
+            search_page=search_page,
+            search_has_more=search_has_more,
+            search_capped=search_capped,
+            search_max_candidates=SEARCH_MAX_CANDIDATES,
             feeds=feeds,
             current_feed_id=feed_id,
             unused_only=unused_only,
             format_date=format_date,
-            truncate_text=truncate_text,
-            get_reading_time=get_reading_time
+            truncate_text=truncate_text
         )
     
     # Drafts routes
     @app.route('/drafts')
     @login_required
     def drafts():
-        drafts = Draft.query.filter_by(user_id=current_user.id).order_by(Draft.updated_at.desc()).all()
-        return render_template('drafts.html', drafts=drafts, format_date=format_date)
+        pagination = keyset_paginate(
+            Draft.query.filter_by(user_id=current_user.id),
+            (Draft.updated_at, Draft.id),
+            per_page=50,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            total=get_user_stats(current_user.id).draft_count
+        )
+        
+        return render_template('drafts.html', drafts=pagination.items, pagination=pagination,
+                               format_date=format_date)
     
     @app.route('/drafts/new', methods=['GET', 'POST'])
     @login_required
@@ -289,6 +320,7 @@ def init_routes(app):
             )
             
             db.session.add(new_draft)
+            bump_user_stats(current_user.id, draft_count=1)
             db.session.commit()
             
             # Save to Notion if API key is set
@@ -313,6 +345,7 @@ def init_routes(app):
         if article_ids:
             selected_articles = (Article.query
                                .join(Feed)
+                               .options(defer(Article.content), contains_eager(Article.feed))
                                .filter(Article.id.in_(article_ids), Feed.user_id == current_user.id)
                                .all())
         
@@ -327,50 +360,25 @@ def init_routes(app):
             flash('Please select at least one article to generate a draft', 'danger')
             return redirect(url_for('articles'))
         
-        articles = (Article.query
-                  .join(Feed)
-                  .filter(Article.id.in_(article_ids), Feed.user_id == current_user.id)
-                  .all())
+        article_count = (Article.query
+                         .join(Feed)
+                         .filter(Article.id.in_(article_ids), Feed.user_id == current_user.id)
+                         .count())
         
-        if not articles:
+        if not article_count:
             flash('No valid articles found', 'danger')
             return redirect(url_for('articles'))
         
-        try:
-            title, content = generate_newsletter_draft(articles)
-            
-            # Mark articles as used
-            for article in articles:
-                article.used_in_draft = True
-            
-            # Create the draft
-            new_draft = Draft(
-                title=title,
-                content=content,
-                user_id=current_user.id
-            )
-            
-            db.session.add(new_draft)
-            db.session.commit()
-            
-            # Save to Notion if API key is set
-            if current_user.notion_api_key:
-                try:
-                    notion_page_id = save_to_notion(new_draft, current_user.notion_api_key)
-                    if notion_page_id:
-                        new_draft.notion_page_id = notion_page_id
-                        db.session.commit()
-                except Exception as e:
-                    logger.error(f"Error saving to Notion: {str(e)}")
-                    flash(f'Draft created but error saving to Notion: {str(e)}', 'warning')
-            
-            flash('Draft generated successfully', 'success')
-            return redirect(url_for('edit_draft', draft_id=new_draft.id))
+        payload = {'article_ids': article_ids}
+        summary_tier = request.form.get('summary_tier')
+        if summary_tier in SUMMARY_TIERS:
+            payload['summary_tier'] = summary_tier
         
-        except Exception as e:
-            logger.error(f"Error generating draft: {str(e)}")
-            flash(f'Error generating draft: {str(e)}', 'danger')
-            return redirect(url_for('articles'))
+        # Summarising can take minutes, so the draft is generated by the worker
+        enqueue_job('generate_draft', payload, user_id=current_user.id, max_attempts=2)
+        
+        flash(f'Generating a draft from {article_count} articles; it will appear here when ready', 'info')
+        return redirect(url_for('drafts'))
     
     @app.route('/drafts/<int:draft_id>/edit', methods=['GET', 'POST'])
     @login_required
@@ -405,12 +413,19 @@ def init_routes(app):
             
         return render_template('draft_editor.html', draft=draft)
     
+    @app.route('/drafts/<int:draft_id>/email-preview')
+    @login_required
+    def preview_draft_email(draft_id):
+        draft = Draft.query.filter_by(id=draft_id, user_id=current_user.id).first_or_404()
+        return render_newsletter(draft.title, draft)
+    
     @app.route('/drafts/<int:draft_id>/delete', methods=['POST'])
     @login_required
     def delete_draft(draft_id):
         draft = Draft.query.filter_by(id=draft_id, user_id=current_user.id).first_or_404()
         
         db.session.delete(draft)
+        bump_user_stats(current_user.id, draft_count=-1)
         db.session.commit()
         
         flash('Draft deleted successfully', 'success')
@@ -455,9 +470,17 @@ def init_routes(app):
         if status_filter:
             query = query.filter_by(status=status_filter)
             
-        newsletters = query.order_by(Newsletter.created_at.desc()).all()
+        pagination = keyset_paginate(
+            query,
+            (Newsletter.created_at, Newsletter.id),
+            per_page=50,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            total=None if status_filter else get_user_stats(current_user.id).newsletter_count
+        )
         
-        return render_template('newsletters.html', newsletters=newsletters, format_date=format_date)
+        return render_template('newsletters.html', newsletters=pagination.items, pagination=pagination,
+                               status_filter=status_filter, format_date=format_date)
     
     @app.route('/newsletters/schedule', methods=['GET', 'POST'])
     @login_required
@@ -497,6 +520,7 @@ def init_routes(app):
             draft.status = 'scheduled'
             
             db.session.add(newsletter)
+            bump_user_stats(current_user.id, newsletter_count=1)
             db.session.commit()
             
             # Send notification if configured
@@ -520,64 +544,25 @@ def init_routes(app):
     def send_newsletter_now(newsletter_id):
         newsletter = Newsletter.query.filter_by(id=newsletter_id, user_id=current_user.id).first_or_404()
         
+        if newsletter.status == 'retrying':
+            flash('This newsletter is already being retried automatically', 'info')
+            return redirect(url_for('newsletters'))
+        
         if newsletter.status not in ['scheduled', 'failed']:
             flash('This newsletter cannot be sent now', 'danger')
             return redirect(url_for('newsletters'))
         
-        # Get subscribers
-        subscribers = Subscriber.query.filter_by(user_id=current_user.id, is_active=True).all()
+        has_subscribers = Subscriber.query.filter_by(user_id=current_user.id, is_active=True).first()
         
-        if not subscribers:
+        if not has_subscribers:
             flash('You have no active subscribers', 'warning')
             return redirect(url_for('newsletters'))
         
-        # Update newsletter status
-        newsletter.status = 'sending'
-        db.session.commit()
+        if not queue_newsletter_send(newsletter.id, current_user.id):
+            flash('This newsletter is already being sent', 'warning')
+            return redirect(url_for('newsletters'))
         
-        try:
-            # Send the newsletter
-            success, error = send_newsletter(
-                newsletter,
-                newsletter.draft.content,
-                subscribers,
-                current_user.sendgrid_api_key
-            )
-            
-            if success:
-                newsletter.status = 'sent'
-                newsletter.sent_at = datetime.utcnow()
-                newsletter.recipient_count = len(subscribers)
-                
-                # Update draft status
-                newsletter.draft.status = 'published'
-                
-                db.session.commit()
-                
-                # Send notification if configured
-                if current_user.telegram_chat_id and current_user.telegram_bot_token:
-                    try:
-                        message = f"Newsletter '{newsletter.subject}' sent to {len(subscribers)} subscribers"
-                        send_notification(current_user.telegram_bot_token, current_user.telegram_chat_id, message)
-                    except Exception as e:
-                        logger.error(f"Error sending Telegram notification: {str(e)}")
-                
-                flash(f'Newsletter sent to {len(subscribers)} subscribers', 'success')
-            else:
-                newsletter.status = 'failed'
-                newsletter.error_message = error
-                db.session.commit()
-                
-                flash(f'Failed to send newsletter: {error}', 'danger')
-                
-        except Exception as e:
-            logger.error(f"Error sending newsletter: {str(e)}")
-            newsletter.status = 'failed'
-            newsletter.error_message = str(e)
-            db.session.commit()
-            
-            flash(f'Error sending newsletter: {str(e)}', 'danger')
-            
+        flash('Newsletter is being sent in the background', 'info')
         return redirect(url_for('newsletters'))
     
     @app.route('/newsletters/<int:newsletter_id>/cancel', methods=['POST'])
@@ -595,6 +580,7 @@ def init_routes(app):
         
         # Delete the newsletter
         db.session.delete(newsletter)
+        bump_user_stats(current_user.id, newsletter_count=-1)
         db.session.commit()
         
         flash('Newsletter cancelled successfully', 'success')
@@ -604,8 +590,28 @@ def init_routes(app):
     @app.route('/subscribers')
     @login_required
     def subscribers():
-        subscribers = Subscriber.query.filter_by(user_id=current_user.id).order_by(Subscriber.created_at.desc()).all()
-        return render_template('subscribers.html', subscribers=subscribers, format_date=format_date)
+        pagination = keyset_paginate(
+            Subscriber.query.filter_by(user_id=current_user.id),
+            (Subscriber.created_at, Subscriber.id),
+            per_page=50,
+            after=request.args.get('after'),
+            before=request.args.get('before')
+        )
+        
+        # Grouped count over the (user_id, is_active) index instead of loading every subscriber
+        counts = dict(db.session.query(Subscriber.is_active, func.count(Subscriber.id))
+                      .filter(Subscriber.user_id == current_user.id)
+                      .group_by(Subscriber.is_active)
+                      .all())
+        
+        return render_template(
+            'subscribers.html',
+            subscribers=pagination.items,
+            pagination=pagination,
+            active_count=counts.get(True, 0),
+            inactive_count=counts.get(False, 0) + counts.get(None, 0),
+            format_date=format_date
+        )
     
     @app.route('/subscribers/add', methods=['POST'])
     @login_required
@@ -704,95 +710,46 @@ def init_routes(app):
         if not api_key or api_key != os.environ.get('SCHEDULER_API_KEY'):
             return jsonify({'error': 'Unauthorized'}), 401
         
-        now = datetime.utcnow()
-        
-        # Find newsletters that are scheduled and due
-        due_newsletters = Newsletter.query.filter(
-            Newsletter.status == 'scheduled',
-            Newsletter.scheduled_for <= now
-        ).all()
-        
-        results = []
-        
-        for newsletter in due_newsletters:
-            user = User.query.get(newsletter.user_id)
-            subscribers = Subscriber.query.filter_by(user_id=user.id, is_active=True).all()
-            
-            if not subscribers:
-                newsletter.status = 'failed'
-                newsletter.error_message = 'No active subscribers'
-                db.session.commit()
-                results.append({
-                    'id': newsletter.id,
-                    'result': 'failed',
-                    'reason': 'No active subscribers'
-                })
-                continue
-            
-            # Update status to sending
-            newsletter.status = 'sending'
-            db.session.commit()
-            
-            try:
-                # Send the newsletter
-                success, error = send_newsletter(
-                    newsletter,
-                    newsletter.draft.content,
-                    subscribers,
-                    user.sendgrid_api_key
-                )
-                
-                if success:
-                    newsletter.status = 'sent'
-                    newsletter.sent_at = now
-                    newsletter.recipient_count = len(subscribers)
-                    
-                    # Update draft status
-                    newsletter.draft.status = 'published'
-                    
-                    db.session.commit()
-                    
-                    # Send notification if configured
-                    if user.telegram_chat_id and user.telegram_bot_token:
-                        try:
-                            message = f"Newsletter '{newsletter.subject}' sent to {len(subscribers)} subscribers"
-                            send_notification(user.telegram_bot_token, user.telegram_chat_id, message)
-                        except Exception as e:
-                            logger.error(f"Error sending Telegram notification: {str(e)}")
-                    
-                    results.append({
-                        'id': newsletter.id,
-                        'result': 'sent',
-                        'recipients': len(subscribers)
-                    })
-                else:
-                    newsletter.status = 'failed'
-                    newsletter.error_message = error
-                    db.session.commit()
-                    
-                    results.append({
-                        'id': newsletter.id,
-                        'result': 'failed',
-                        'reason': error
-                    })
-                    
-            except Exception as e:
-                logger.error(f"Error sending scheduled newsletter: {str(e)}")
-                newsletter.status = 'failed'
-                newsletter.error_message = str(e)
-                db.session.commit()
-                
-                results.append({
-                    'id': newsletter.id,
-                    'result': 'failed',
-                    'reason': str(e)
-                })
+        # Claim due newsletters and hand them to the workers instead of sending inline
+        claimed = claim_due_newsletters()
         
         return jsonify({
-            'processed': len(results),
-            'results': results
+            'processed': len(claimed),
+            'results': [{'id': newsletter_id, 'result': 'queued'} for newsletter_id in claimed]
         })
     
+    # API routes for polling background jobs
+    @app.route('/api/jobs')
+    @login_required
+    def list_jobs():
+        jobs = (Job.query
+                .filter_by(user_id=current_user.id)
+                .order_by(Job.created_at.desc())
+                .limit(20)
+                .all())
+        return jsonify({'jobs': [job.to_dict() for job in jobs]})
+    
+    @app.route('/api/jobs/<int:job_id>')
+    @login_required
+    def job_status(job_id):
+        job = Job.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+        return jsonify(job.to_dict())
+    
+    @app.route('/api/newsletters/<int:newsletter_id>/deliveries')
+    @login_required
+    def newsletter_deliveries(newsletter_id):
+        newsletter = Newsletter.query.filter_by(id=newsletter_id, user_id=current_user.id).first_or_404()
+        counts = (db.session.query(DeliveryLog.status, db.func.count(DeliveryLog.id))
+                  .filter_by(newsletter_id=newsletter.id)
+                  .group_by(DeliveryLog.status)
+                  .all())
+        return jsonify({'newsletter_id': newsletter.id, 'status': newsletter.status, 'deliveries': dict(counts)})
+    
+    @app.route('/api/summary-cache/stats')
+    @login_required
+    def summary_cache_stats():
+        return jsonify(get_summary_cache_stats())
+    
     # Error handlers
     @app.errorhandler(404)
     def page_not_found(e):
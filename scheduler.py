@@ -0,0 +1,6 @@
+from app import app
+from services.scheduler import run_scheduler
+
+if __name__ == "__main__":
+    with app.app_context():
+        run_scheduler()
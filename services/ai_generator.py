@@ -1,65 +1,101 @@
+import gc
 import logging
 import os
+import re
+import time
+import random
+import threading
 import requests
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqGeneration
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from services.summary_cache import summary_cache_key, get_cached_summaries, store_summaries
+from utils.helpers import STOP_WORDS, strip_html
 
 logger = logging.getLogger(__name__)
 
 # Try to use a smaller model that can fit in memory
 DEFAULT_MODEL = "facebook/bart-large-cnn"
 HUGGINGFACE_API_KEY = os.environ.get("HUGGINGFACE_API_KEY")
+HUGGINGFACE_API_URL = f"https://api-inference.huggingface.co/models/{DEFAULT_MODEL}"
 
-def generate_newsletter_draft(articles):
+# How articles are summarized: "fast" (extractive, no model), "local-abstractive" or "api"
+SUMMARY_TIERS = ("fast", "local-abstractive", "api")
+SUMMARY_TIER = os.environ.get("SUMMARY_TIER") or ("api" if HUGGINGFACE_API_KEY else "local-abstractive")
+
+# Extractive summaries: number of sentences kept
+EXTRACTIVE_SENTENCES = int(os.environ.get("EXTRACTIVE_SENTENCES", 3))
+EXTRACTIVE_MAX_INPUT = 20000
+SENTENCE_PATTERN = re.compile(r'(?:(?<=[.!?])|(?<=[.!?]["\'\u201d)]))\s+(?=["\'(\u201c]?[A-Z0-9])')
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Hugging Face API client: concurrent requests, texts per request and retries on 429/503
+HF_API_MAX_WORKERS = int(os.environ.get("HF_API_MAX_WORKERS", 8))
+HF_API_BATCH_SIZE = int(os.environ.get("HF_API_BATCH_SIZE", 1))
+HF_API_TIMEOUT = float(os.environ.get("HF_API_TIMEOUT", 60))
+HF_API_MAX_RETRIES = int(os.environ.get("HF_API_MAX_RETRIES", 5))
+HF_API_RETRY_BASE_DELAY = 1.0
+HF_API_RETRY_MAX_DELAY = 30.0
+
+# Local model and inference backend: "torch", "int8" (dynamically quantized torch, CPU)
+# or "onnx" (ONNX Runtime, needs optimum[onnxruntime]). LOCAL_SUMMARIZER_MODEL may name a
+# smaller distilled checkpoint such as sshleifer/distilbart-cnn-12-6
+LOCAL_SUMMARIZER_MODEL = os.environ.get("LOCAL_SUMMARIZER_MODEL", DEFAULT_MODEL)
+SUMMARIZER_BACKENDS = ("torch", "int8", "onnx")
+SUMMARIZER_BACKEND = os.environ.get("SUMMARIZER_BACKEND", "torch")
+
+# Number of articles summarised per generate() call by the local model
+SUMMARY_BATCH_SIZE = int(os.environ.get("SUMMARY_BATCH_SIZE", 8))
+
+# Local model cache: unload after this many idle seconds (0 keeps it loaded), or when
+# available memory drops below SUMMARIZER_MIN_AVAILABLE_MB (0 disables the check)
+SUMMARIZER_IDLE_TIMEOUT = int(os.environ.get("SUMMARIZER_IDLE_TIMEOUT", 1800))
+SUMMARIZER_MIN_AVAILABLE_MB = int(os.environ.get("SUMMARIZER_MIN_AVAILABLE_MB", 0))
+SUMMARIZER_REAP_INTERVAL = 60
+
+_summarizers = {}
+_summarizers_last_used = {}
+_summarizers_pinned = set()  # preloaded before forking workers; never unloaded
+_summarizers_lock = threading.Lock()
+_reaper = None
+
+_api_session = None
+_api_session_lock = threading.Lock()
+
+
+def generate_newsletter_draft(articles, tier=None):
     """
     Generate a newsletter draft from a list of articles
     
     Args:
         articles: List of Article objects
+        tier: Summary tier (optional, defaults to SUMMARY_TIER); stored summaries are only
+            reused when they were made with the same tier
     
     Returns:
         tuple: (title, content)
     """
+    tier = tier or SUMMARY_TIER
+    
     try:
-        # Prepare article summaries
-        article_texts = []
-        article_titles = []
+        article_titles = [article.title for article in articles]
         
-        for article in articles:
-            article_titles.append(article.title)
-            
-            # Use original content or summary (max 1000 chars)
-            article_content = article.content[:1000] if article.content else ""
-            article_texts.append(f"Title: {article.title}\nSource: {article.url}\n\nContent: {article_content}")
+        # Use summaries stored at ingestion time and only summarize the rest
+        summaries = [article.summary if article.summary_tier == tier else None for article in articles]
+        missing = [i for i, summary in enumerate(summaries) if not summary]
+        
+        if missing:
+            for i, summary in zip(missing, summarize_articles([articles[i] for i in missing], tier)):
+                summaries[i] = summary
         
-        # Generate summaries for each article
         article_summaries = []
         
-        if HUGGINGFACE_API_KEY:
-            # Use Hugging Face Inference API for production use
-            for i, text in enumerate(article_texts):
-                summary = summarize_text_api(text)
-                if summary:
-                    article_summaries.append(f"## {article_titles[i]}\n\n{summary}\n\nRead more: {articles[i].url}")
-                else:
-                    # Fallback to using the title and URL if summary fails
-                    article_summaries.append(f"## {article_titles[i]}\n\nRead more: {articles[i].url}")
-        else:
-            # Load the model locally (this can be memory intensive)
-            try:
-                summarizer = get_local_summarizer()
-                
-                for i, text in enumerate(article_texts):
-                    if text:
-                        summary = summarize_text_local(summarizer, text)
-                        article_summaries.append(f"## {article_titles[i]}\n\n{summary}\n\nRead more: {articles[i].url}")
-                    else:
-                        # Fallback to using the title and URL if no content
-                        article_summaries.append(f"## {article_titles[i]}\n\nRead more: {articles[i].url}")
-            except Exception as e:
-                logger.error(f"Error loading local summarizer: {str(e)}")
-                # Fall back to using titles and URLs only
-                for i, title in enumerate(article_titles):
-                    article_summaries.append(f"## {title}\n\nRead more: {articles[i].url}")
+        for article, summary in zip(articles, summaries):
+            if summary:
+                article_summaries.append(f"## {article.title}\n\n{summary}\n\nRead more: {article.url}")
+            else:
+                # Fallback to using the title and URL if summary fails
+                article_summaries.append(f"## {article.title}\n\nRead more: {article.url}")
         
         # Generate a newsletter title
         if len(article_titles) > 1:
@@ -78,70 +114,550 @@ def generate_newsletter_draft(articles):
         raise
 
 
+def summarize_articles(articles, tier=None):
+    """
+    Summarize articles with the given tier
+    
+    Each summary is also stored on its article along with the tier (the
+    caller commits). Articles the "local-abstractive" or "api" tier fails
+    on get an extractive summary instead, which is returned but not stored
+    so a later run can still replace it.
+    
+    Args:
+        articles: List of Article objects
+        tier: "fast", "local-abstractive" or "api" (optional, defaults to SUMMARY_TIER)
+    
+    Returns:
+        list: Summaries in the same order as the articles ("" where no summary could be made)
+    """
+    tier = tier or SUMMARY_TIER
+    
+    if tier not in SUMMARY_TIERS:
+        raise ValueError(f"Unknown summary tier '{tier}'")
+    
+    # Use original content (max 1000 chars)
+    article_texts = [
+        f"Title: {article.title}\nSource: {article.url}\n\nContent: {article.content[:1000] if article.content else ''}"
+        for article in articles
+    ]
+    
+    if tier == "fast":
+        summaries = summarize_texts_extractive([article.content for article in articles])
+    elif tier == "api":
+        # Use Hugging Face Inference API for production use
+        summaries = summarize_texts_api(article_texts)
+    else:
+        # Load the model locally (this can be memory intensive)
+        try:
+            summaries = summarize_texts_local(get_local_summarizer(), article_texts)
+        except Exception as e:
+            logger.error(f"Error loading local summarizer: {str(e)}")
+            summaries = [""] * len(articles)
+    
+    for article, summary in zip(articles, summaries):
+        if summary:
+            article.summary = summary
+            article.summary_tier = tier
+    
+    # Fall back to extractive summaries rather than titles only
+    failed = [i for i, summary in enumerate(summaries) if not summary]
+    if failed and tier != "fast":
+        logger.warning(f"Using extractive summaries for {len(failed)} articles the {tier} tier failed on")
+        for i, summary in zip(failed, summarize_texts_extractive([articles[i].content for i in failed])):
+            summaries[i] = summary
+    
+    return summaries
+
+
+def summarize_texts_extractive(texts, max_sentences=EXTRACTIVE_SENTENCES):
+    """
+    Summarize many texts with summarize_text_extractive
+    
+    Args:
+        texts: List of texts to summarize
+        max_sentences: Number of sentences kept per summary
+    
+    Returns:
+        list: Summaries in the same order as `texts`
+    """
+    started = time.monotonic()
+    summaries = []
+    
+    for text in texts:
+        try:
+            summaries.append(summarize_text_extractive(text, max_sentences))
+        except Exception as e:
+            logger.error(f"Error summarizing text extractively: {str(e)}")
+            summaries.append("")
+    
+    elapsed = time.monotonic() - started
+    logger.info(f"Summarized {len(texts)} articles extractively in {elapsed * 1000:.1f}ms")
+    return summaries
+
+
+def summarize_text_extractive(text, max_sentences=EXTRACTIVE_SENTENCES):
+    """
+    Summarize text by picking its most representative sentences
+    
+    Sentences are weighted as TF-IDF vectors (each sentence counting as a
+    document) and scored by their similarity to the whole text, with a
+    small bonus for leading sentences. The best `max_sentences` are kept in
+    their original order. Needs no model and takes milliseconds.
+    
+    Args:
+        text: Text to summarize, plain text or HTML
+        max_sentences: Number of sentences to keep
+    
+    Returns:
+        str: The summary ("" for empty text)
+    """
+    # Feed content often comes as HTML; markup would otherwise end up in the summary
+    text = strip_html(text)[:EXTRACTIVE_MAX_INPUT]
+    sentences = [sentence for sentence in SENTENCE_PATTERN.split(text) if sentence]
+    
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)
+    
+    vocabulary = {}
+    rows = []
+    columns = []
+    for i, sentence in enumerate(sentences):
+        for word in WORD_PATTERN.findall(sentence.lower()):
+            if word not in STOP_WORDS:
+                rows.append(i)
+                columns.append(vocabulary.setdefault(word, len(vocabulary)))
+    
+    if not vocabulary:
+        return " ".join(sentences[:max_sentences])
+    
+    counts = np.zeros((len(sentences), len(vocabulary)))
+    np.add.at(counts, (rows, columns), 1)
+    
+    idf = np.log(len(sentences) / np.count_nonzero(counts, axis=0)) + 1
+    weights = counts * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    weights = np.divide(weights, norms, out=np.zeros_like(weights), where=norms > 0)
+    
+    scores = weights @ weights.sum(axis=0)
+    scores *= 1 + 0.5 / np.arange(1, len(sentences) + 1)
+    
+    best = np.sort(np.argsort(-scores, kind="stable")[:max_sentences])
+    return " ".join(sentences[i] for i in best)
+
+
 def summarize_text_api(text, max_length=150):
     """Use Hugging Face Inference API to summarize text"""
+    return summarize_texts_api([text], max_length=max_length)[0]
+
+
+def summarize_texts_api(texts, max_length=150, batch_size=HF_API_BATCH_SIZE, max_workers=HF_API_MAX_WORKERS):
+    """
+    Summarize many texts with the Hugging Face Inference API in parallel
+    
+    Cached summaries are reused; the remaining texts are sent `batch_size`
+    per request as an `inputs` list, with at most `max_workers` requests in
+    flight over a shared connection pool. Worker threads only do HTTP, the
+    summary cache is read and written on the calling thread.
+    
+    Args:
+        texts: List of texts to summarize
+        max_length: Maximum summary length in tokens
+        batch_size: Texts per request (1 sends a plain string, which every endpoint accepts)
+        max_workers: Maximum number of concurrent requests
+    
+    Returns:
+        list: Summaries in the same order as `texts` ("" where summarization failed)
+    """
+    summaries = [""] * len(texts)
+    
+    # Truncate input text if necessary
+    max_input_length = 1024
+    texts = [text[:max_input_length] if text else "" for text in texts]
+    
+    cache_model = f"api:{DEFAULT_MODEL}"
+    parameters = {"max_length": max_length, "min_length": 30}
+    cache_keys = [summary_cache_key(cache_model, parameters, text) for text in texts]
+    cached = get_cached_summaries(cache_keys)
+    
+    # Identical texts in the same call are only sent once
+    pending = {}
+    for i, cache_key in enumerate(cache_keys):
+        if not texts[i]:
+            continue
+        if cache_key in cached:
+            summaries[i] = cached[cache_key]
+        else:
+            pending.setdefault(cache_key, i)
+    
+    if not pending:
+        store_summaries([], hits=cached)
+        return summaries
+    
+    started = time.monotonic()
+    todo = list(pending.values())
+    batches = [todo[start:start + batch_size] for start in range(0, len(todo), max(1, batch_size))]
+    session = get_api_session()
+    
+    def request(batch):
+        batch_started = time.monotonic()
+        inputs = [texts[i] for i in batch] if batch_size > 1 else texts[batch[0]]
+        result = post_inference(session, inputs, dict(parameters, do_sample=False))
+        return result, (time.monotonic() - batch_started) * 1000
+    
+    computed = []
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+        futures = {executor.submit(request, batch): batch for batch in batches}
+        
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                result, batch_ms = future.result()
+                
+                if not isinstance(result, list) or len(result) != len(batch):
+                    logger.warning(f"Unexpected response format: {result}")
+                    continue
+                
+                for i, item in zip(batch, result):
+                    # Batched responses may wrap each result in its own list
+                    if isinstance(item, list):
+                        item = item[0] if item else {}
+                    summary = item.get('summary_text', '') if isinstance(item, dict) else ''
+                    if summary:
+                        summaries[i] = summary
+                        computed.append((cache_keys[i], cache_model, summary, batch_ms / len(batch)))
+            except Exception as e:
+                logger.error(f"Error using Hugging Face API: {str(e)}")
+    
+    # Copy results to duplicate texts
+    for i, cache_key in enumerate(cache_keys):
+        if cache_key in pending:
+            summaries[i] = summaries[pending[cache_key]]
+    
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Summarized {len(computed)} of {len(todo)} articles with the Hugging Face API in {elapsed:.2f}s "
+        f"({len(batches)} requests, {max_workers} concurrent)"
+    )
+    
+    store_summaries(computed, hits=cached)
+    return summaries
+
+
+def get_api_session():
+    """
+    Return the process-wide pooled session used for Hugging Face API calls
+    
+    Returns:
+        requests.Session: Shared session carrying the API key
+    """
+    global _api_session
+    
+    with _api_session_lock:
+        if _api_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HF_API_MAX_WORKERS)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['Authorization'] = f"Bearer {HUGGINGFACE_API_KEY}"
+            _api_session = session
+        return _api_session
+
+
+def post_inference(session, inputs, parameters, max_retries=HF_API_MAX_RETRIES, timeout=HF_API_TIMEOUT):
+    """
+    POST to the Hugging Face Inference API, retrying when the model is loading or rate limited
+    
+    503 (model loading) and 429 (rate limited) responses and connection
+    errors are retried with jittered exponential backoff, honouring
+    Retry-After and the API's `estimated_time` hint. `wait_for_model` asks
+    the API to hold the request until a cold model is loaded instead of
+    failing straight away.
+    
+    Args:
+        session: requests.Session from get_api_session
+        inputs: Text or list of texts
+        parameters: Generation parameters
+        max_retries: Number of retries before giving up
+        timeout: Seconds allowed for each request
+    
+    Returns:
+        The decoded JSON response
+    """
+    payload = {
+        "inputs": inputs,
+        "parameters": parameters,
+        "options": {"wait_for_model": True}
+    }
+    
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.post(HUGGINGFACE_API_URL, json=payload, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            delay = api_retry_delay(attempt)
+            logger.warning(f"Hugging Face API request failed ({str(e)}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        
+        if response.status_code not in (429, 503) or attempt == max_retries:
+            response.raise_for_status()
+            return response.json()
+        
+        delay = api_retry_delay(attempt)
+        try:
+            if response.headers.get('Retry-After'):
+                delay = max(delay, float(response.headers['Retry-After']))
+            else:
+                delay = max(delay, float(response.json().get('estimated_time', 0)))
+        except (ValueError, AttributeError):
+            pass
+        delay = min(delay, HF_API_RETRY_MAX_DELAY)
+        
+        logger.warning(f"Hugging Face API returned {response.status_code}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def api_retry_delay(attempt):
+    """Exponential backoff delay in seconds, jittered so parallel requests don't retry in lockstep"""
+    delay = min(HF_API_RETRY_MAX_DELAY, HF_API_RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
+
+
+def get_local_summarizer(model_name=None, backend=None, pin=False):
+    """
+    Return the process-wide local summarization model, loading it on first use
+    
+    The model stays cached for later drafts until it has been idle for
+    SUMMARIZER_IDLE_TIMEOUT seconds or the machine runs low on memory.
+    Model and backend default to LOCAL_SUMMARIZER_MODEL and SUMMARIZER_BACKEND.
+    
+    A pinned model is never unloaded, and pinning does not start the reaper
+    thread, so it is safe to call before forking: every child keeps sharing
+    the parent's copy instead of reloading a private one after an idle spell.
+    """
+    global _reaper
+    
+    model_name = model_name or LOCAL_SUMMARIZER_MODEL
+    backend = backend or SUMMARIZER_BACKEND
+    key = f"{model_name} ({backend})"
+    
+    with _summarizers_lock:
+        summarizer = _summarizers.get(key)
+        
+        if summarizer is None:
+            summarizer = load_local_summarizer(model_name, backend)
+            _summarizers[key] = summarizer
+        
+        _summarizers_last_used[key] = time.monotonic()
+        
+        if pin:
+            _summarizers_pinned.add(key)
+        elif _reaper is None or not _reaper.is_alive():
+            _reaper = threading.Thread(target=_reap_summarizers, name="summarizer-reaper", daemon=True)
+            _reaper.start()
+        
+        return summarizer
+
+
+def load_local_summarizer(model_name=DEFAULT_MODEL, backend="torch"):
+    """
+    Load a local summarization model with the given inference backend
+    
+    "int8" quantizes the Linear layers of the torch model to int8 after
+    loading, which roughly halves memory and speeds up CPU inference.
+    "onnx" runs the model with ONNX Runtime; `model_name` may point at a
+    directory exported with `optimum-cli export onnx`, otherwise the model
+    is exported on load, which takes a few minutes for bart-large-cnn.
+    The backend is recorded on the returned pipeline as `backend`.
+    """
+    if backend not in SUMMARIZER_BACKENDS:
+        raise ValueError(f"Unknown summarizer backend '{backend}'")
+    
     try:
-        API_URL = "https://api-inference.huggingface.co/models/facebook/bart-large-cnn"
-        headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"}
+        from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
         
-        # Truncate input text if necessary
-        max_input_length = 1024
-        if len(text) > max_input_length:
-            text = text[:max_input_length]
+        started = time.monotonic()
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        
+        if backend == "onnx":
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
             
-        payload = {
-            "inputs": text,
-            "parameters": {
-                "max_length": max_length,
-                "min_length": 30,
-                "do_sample": False
-            }
-        }
-        
-        response = requests.post(API_URL, headers=headers, json=payload)
-        result = response.json()
-        
-        if isinstance(result, list) and len(result) > 0:
-            return result[0].get('summary_text', '')
-        elif isinstance(result, dict) and 'summary_text' in result:
-            return result['summary_text']
+            export = not os.path.exists(os.path.join(model_name, "encoder_model.onnx"))
+            model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=export)
         else:
-            logger.warning(f"Unexpected response format: {result}")
-            return ""
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+            model.eval()
             
-    except Exception as e:
-        logger.error(f"Error using Hugging Face API: {str(e)}")
-        return ""
-
-
-def get_local_summarizer():
-    """Load a local summarization model"""
-    try:
-        tokenizer = AutoTokenizer.from_pretrained(DEFAULT_MODEL)
-        model = AutoModelForSeq2SeqGeneration.from_pretrained(DEFAULT_MODEL)
+            if backend == "int8":
+                import torch
+                
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        
         summarizer = pipeline("summarization", model=model, tokenizer=tokenizer)
+        summarizer.backend = backend
+        
+        logger.info(f"Loaded local summarizer {model_name} ({backend}) in {time.monotonic() - started:.1f}s")
         return summarizer
     except Exception as e:
         logger.error(f"Error loading local summarizer: {str(e)}")
         raise
 
 
-def summarize_text_local(summarizer, text, max_length=150):
-    """Use local Hugging Face model to summarize text"""
+def warm_up_summarizer(model_name=None, run_inference=True, pin=False):
+    """
+    Load the local summarizer ahead of the first draft
+    
+    Call with run_inference=False and pin=True before forking worker
+    processes so the weights are shared copy-on-write without starting
+    torch's thread pools or the reaper thread in the parent, and are never
+    unloaded (and reloaded privately) by a child.
+    """
+    summarizer = get_local_summarizer(model_name, pin=pin)
+    
+    if run_inference:
+        summarize_texts_local(summarizer, ["Warm-up text for the summarization model. " * 8], max_length=40)
+
+
+def evict_summarizers(reason):
+    """Unload all cached local summarization models except pinned ones"""
+    with _summarizers_lock:
+        keys = [key for key in _summarizers if key not in _summarizers_pinned]
+        if not keys:
+            return
+        
+        logger.info(f"Unloading local summarizers ({reason}): {', '.join(keys)}")
+        for key in keys:
+            del _summarizers[key]
+            del _summarizers_last_used[key]
+    
+    gc.collect()
+
+
+def available_memory_mb():
+    """Return the available system memory in MB, or None if it cannot be determined"""
     try:
-        # Truncate input text if necessary
-        max_input_length = summarizer.tokenizer.model_max_length
-        input_ids = summarizer.tokenizer.encode(text, truncation=True, max_length=max_input_length)
-        truncated_text = summarizer.tokenizer.decode(input_ids, skip_special_tokens=True)
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reap_summarizers():
+    """Background loop that unloads idle models and frees memory under pressure"""
+    while True:
+        time.sleep(SUMMARIZER_REAP_INTERVAL)
         
-        summary = summarizer(truncated_text, max_length=max_length, min_length=30, do_sample=False)
+        with _summarizers_lock:
+            last_used = [used for key, used in _summarizers_last_used.items() if key not in _summarizers_pinned]
+            if not last_used:
+                continue
+            idle = time.monotonic() - max(last_used)
         
-        if summary and len(summary) > 0:
-            return summary[0]['summary_text']
-        return ""
-    except Exception as e:
-        logger.error(f"Error summarizing text locally: {str(e)}")
-        return ""
+        if SUMMARIZER_IDLE_TIMEOUT and idle > SUMMARIZER_IDLE_TIMEOUT:
+            evict_summarizers(f"idle for {idle:.0f}s")
+            continue
+        
+        available = available_memory_mb()
+        if SUMMARIZER_MIN_AVAILABLE_MB and available is not None and available < SUMMARIZER_MIN_AVAILABLE_MB:
+            evict_summarizers(f"only {available} MB of memory available")
+
+
+def summarize_text_local(summarizer, text, max_length=150):
+    """Use local Hugging Face model to summarize text"""
+    return summarize_texts_local(summarizer, [text], max_length=max_length)[0]
+
+
+def summarize_texts_local(summarizer, texts, max_length=150, batch_size=SUMMARY_BATCH_SIZE):
+    """
+    Summarize many texts with the local model in padded batches
+    
+    All texts are tokenized (and truncated to the model's input limit) in
+    one call and looked up in the summary cache by their token IDs. The
+    misses are sorted by length so each batch pads as little as possible,
+    generated `batch_size` at a time and added to the cache.
+    
+    Args:
+        summarizer: Summarization pipeline from get_local_summarizer
+        texts: List of texts to summarize
+        max_length: Maximum summary length in tokens
+        batch_size: Number of texts per generate() call
+    
+    Returns:
+        list: Summaries in input order, empty strings for empty texts or failed batches
+    """
+    summaries = [""] * len(texts)
+    indices = [i for i, text in enumerate(texts) if text]
+    
+    if not indices:
+        return summaries
+    
+    import torch
+    
+    tokenizer = summarizer.tokenizer
+    model = summarizer.model
+    started = time.monotonic()
+    
+    encoded = tokenizer([texts[i] for i in indices], truncation=True, max_length=tokenizer.model_max_length)
+    
+    # Reuse summaries of identical inputs
+    backend = getattr(summarizer, 'backend', 'torch')
+    cache_model = f"local:{model.config.name_or_path}" if backend == 'torch' else f"local-{backend}:{model.config.name_or_path}"
+    cache_params = {'max_length': max_length, 'min_length': 30}
+    cache_keys = [summary_cache_key(cache_model, cache_params, input_ids) for input_ids in encoded['input_ids']]
+    cached = get_cached_summaries(cache_keys)
+    
+    # Identical inputs in the same call are generated once
+    pending = {}
+    for j, cache_key in enumerate(cache_keys):
+        if cache_key in cached:
+            summaries[indices[j]] = cached[cache_key]
+        else:
+            pending.setdefault(cache_key, j)
+    
+    if not pending:
+        store_summaries([], hits=cached)
+        return summaries
+    
+    by_length = sorted(pending.values(), key=lambda j: len(encoded['input_ids'][j]), reverse=True)
+    computed = []
+    
+    for start in range(0, len(by_length), batch_size):
+        batch = by_length[start:start + batch_size]
+        batch_started = time.monotonic()
+        try:
+            inputs = tokenizer.pad({
+                'input_ids': [encoded['input_ids'][j] for j in batch],
+                'attention_mask': [encoded['attention_mask'][j] for j in batch],
+            }, return_tensors='pt')
+            
+            with torch.inference_mode():
+                output_ids = model.generate(**inputs, max_length=max_length, min_length=30, do_sample=False)
+            
+            batch_ms = (time.monotonic() - batch_started) * 1000
+            for j, summary in zip(batch, tokenizer.batch_decode(output_ids, skip_special_tokens=True)):
+                summaries[indices[j]] = summary.strip()
+                computed.append((cache_keys[j], cache_model, summaries[indices[j]], batch_ms / len(batch)))
+        except Exception as e:
+            logger.error(f"Error summarizing text locally: {str(e)}")
+    
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Summarized {len(pending)} articles locally in {elapsed:.2f}s "
+        f"({len(pending) / elapsed if elapsed > 0 else 0:.2f} articles/s, batch size {batch_size})"
+    )
+    
+    # Copy results to duplicate inputs
+    for j, cache_key in enumerate(cache_keys):
+        if cache_key in pending:
+            summaries[indices[j]] = summaries[indices[pending[cache_key]]]
+    
+    store_summaries(computed, hits=cached)
+    return summaries
 
 
 def generate_title(article_titles, max_titles=5):
@@ -1,21 +1,45 @@
 import os
+import time
+import random
 import logging
 import sys
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content, Personalization
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, date
+from app import app
+from services.email_transport import EMAIL_TRANSPORT, get_transport
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
 
 logger = logging.getLogger(__name__)
 
-def send_newsletter(newsletter, content_html, subscribers, api_key=None):
+# SendGrid accepts at most 1000 personalizations per request
+SENDGRID_MAX_BATCH_SIZE = 1000
+SENDGRID_BATCH_SIZE = min(int(os.environ.get('SENDGRID_BATCH_SIZE', SENDGRID_MAX_BATCH_SIZE)), SENDGRID_MAX_BATCH_SIZE)
+SENDGRID_MAX_WORKERS = int(os.environ.get('SENDGRID_MAX_WORKERS', 4))
+SENDGRID_MAX_RETRIES = int(os.environ.get('SENDGRID_MAX_RETRIES', 3))
+SENDGRID_RETRY_BASE_DELAY = 2.0
+
+# Rendered newsletter HTML, keyed by draft id and updated_at
+RENDER_CACHE_SIZE = int(os.environ.get('EMAIL_RENDER_CACHE_SIZE', 64))
+
+_render_cache = OrderedDict()
+_render_cache_lock = threading.Lock()
+
+def send_newsletter(newsletter, content_html, subscribers, api_key=None, on_batch=None):
     """
-    Send a newsletter to subscribers via SendGrid
+    Send a newsletter to subscribers via SendGrid (or the configured EMAIL_TRANSPORT)
     
     Args:
         newsletter: Newsletter object
         content_html: HTML content of the newsletter
-        subscribers: List of Subscriber objects
+        subscribers: List of Subscriber objects, or rows with email and name attributes
         api_key: SendGrid API key (optional, falls back to env var)
+        on_batch: Called with (result, subscribers) as each batch is sent or finally fails (optional)
     
     Returns:
         tuple: (success, error_message)
@@ -28,37 +52,32 @@ def send_newsletter(newsletter, content_html, subscribers, api_key=None):
         # Get API key
         sendgrid_key = api_key or os.environ.get('SENDGRID_API_KEY')
         
-        if not sendgrid_key:
+        if not sendgrid_key and EMAIL_TRANSPORT == 'sendgrid':
             return False, "SendGrid API key not configured"
         
-        sg = SendGridAPIClient(sendgrid_key)
-        
-        # Format content
-        formatted_content = format_newsletter_content(newsletter.subject, content_html)
+        # Format content, reusing the cached render when sending the draft as saved
+        draft = newsletter.draft
+        if draft is not None and draft.content == content_html:
+            formatted_content = render_newsletter(newsletter.subject, draft)
+        else:
+            formatted_content = format_newsletter_content(newsletter.subject, content_html)
         
-        # Create message
-        message = Mail(
-            from_email=Email(os.environ.get('FROM_EMAIL', 'newsletter@example.com')),
-            subject=newsletter.subject
-        )
+        recipients = [(subscriber.email, subscriber.name) for subscriber in subscribers]
         
-        # Add subscribers
-        for subscriber in subscribers:
-            personalization = Personalization()
-            personalization.add_to(To(subscriber.email, subscriber.name))
-            message.add_personalization(personalization)
+        def checkpoint(result):
+            on_batch(result, subscribers[result['offset']:result['offset'] + result['recipients']])
         
-        # Add content
-        message.content = Content("text/html", formatted_content)
+        results = send_batches(sendgrid_key, newsletter.subject, formatted_content, recipients,
+                               on_batch=checkpoint if on_batch else None)
         
-        # Send the message
-        response = sg.send(message)
+        failed = [result for result in results if result['status'] != 'sent']
         
-        if response.status_code >= 200 and response.status_code < 300:
-            logger.info(f"Newsletter sent successfully to {len(subscribers)} subscribers")
+        if not failed:
+            logger.info(f"Newsletter sent successfully to {len(subscribers)} subscribers in {len(results)} batches")
             return True, None
         else:
-            error_msg = f"SendGrid error: Status code {response.status_code}"
+            error_msg = (f"SendGrid error: {len(failed)} of {len(results)} batches failed "
+                         f"({sum(result['recipients'] for result in failed)} recipients): {failed[0]['error']}")
             logger.error(error_msg)
             return False, error_msg
             
@@ -68,6 +87,125 @@ def send_newsletter(newsletter, content_html, subscribers, api_key=None):
         return False, error_msg
 
 
+def send_batches(api_key, subject, html_content, recipients, batch_size=SENDGRID_BATCH_SIZE,
+                 max_workers=SENDGRID_MAX_WORKERS, max_retries=SENDGRID_MAX_RETRIES, on_batch=None):
+    """
+    Send one email to many recipients in concurrent, rate-limited SendGrid requests
+    
+    Recipients are split into requests of at most `batch_size`
+    personalizations (one per recipient, so addresses stay private) and
+    handed to the configured email transport. Batches
+    that fail with a rate limit, server or connection error are retried
+    with jittered exponential backoff; batches already accepted are never
+    sent again. When a transport reports that it failed partway through a
+    batch, the recipients it had already delivered become a 'sent' result
+    of their own and only the rest of the batch is retried. `on_batch` is
+    called on the calling thread as soon as a batch (or such a delivered
+    part of one) is sent or has failed for good, so callers can checkpoint.
+    
+    Args:
+        api_key: SendGrid API key (unused by other transports)
+        subject: Email subject
+        html_content: Formatted HTML body
+        recipients: List of (email, name) tuples
+        batch_size: Recipients per request (at most 1000)
+        max_workers: Maximum number of concurrent requests
+        max_retries: Retries for each failed batch
+        on_batch: Called with the batch's result dict once its outcome is final (optional)
+    
+    Returns:
+        list: One dict per batch (or delivered part of a batch), ordered by offset, with batch,
+            offset (index of its first recipient), recipients, status ('sent' or 'failed'),
+            status_code, attempts and error
+    """
+    batch_size = max(1, min(batch_size, SENDGRID_MAX_BATCH_SIZE))
+    batches = [recipients[start:start + batch_size] for start in range(0, len(recipients), batch_size)]
+    results = [
+        {'batch': i, 'offset': i * batch_size, 'recipients': len(batch), 'status': 'pending',
+         'status_code': None, 'attempts': 0, 'error': None}
+        for i, batch in enumerate(batches)
+    ]
+    
+    transport = get_transport()
+    from_email = os.environ.get('FROM_EMAIL', 'newsletter@example.com')
+    started = time.monotonic()
+    pending = list(range(len(batches)))
+    delivered_parts = []
+    
+    for attempt in range(max_retries + 1):
+        if attempt:
+            delay = SENDGRID_RETRY_BASE_DELAY * (2 ** (attempt - 1))
+            delay = random.uniform(delay / 2, delay)
+            logger.info(f"Retrying {len(pending)} failed SendGrid batches in {delay:.1f}s")
+            time.sleep(delay)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+            futures = {
+                executor.submit(transport, api_key, build_message(from_email, subject, html_content, batches[i])): i
+                for i in pending
+            }
+            
+            for future in as_completed(futures):
+                i = futures[future]
+                result = results[i]
+                result['attempts'] += 1
+                result['status_code'], result['error'], *partial = future.result()
+                result['status'] = 'sent' if result['error'] is None else 'failed'
+                
+                # Split off the recipients a failed request still delivered so they aren't sent again
+                delivered = partial[0] if partial and result['error'] is not None else 0
+                if delivered:
+                    part = dict(result, recipients=delivered, status='sent', status_code=None, error=None)
+                    delivered_parts.append(part)
+                    if on_batch:
+                        on_batch(part)
+                    
+                    batches[i] = batches[i][delivered:]
+                    result['offset'] += delivered
+                    result['recipients'] -= delivered
+                
+                if on_batch and (result['status'] == 'sent' or attempt == max_retries
+                                 or not is_retryable(result['status_code'])):
+                    on_batch(result)
+        
+        pending = [i for i in pending if results[i]['status'] == 'failed' and is_retryable(results[i]['status_code'])]
+        
+        if not pending:
+            break
+    
+    results = sorted(results + delivered_parts, key=lambda result: result['offset'])
+    sent = sum(result['recipients'] for result in results if result['status'] == 'sent')
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Sent to {sent} of {len(recipients)} recipients in {len(batches)} batches in {elapsed:.2f}s "
+        f"({sent / elapsed if elapsed > 0 else 0:.0f} recipients/s)"
+    )
+    
+    return results
+
+
+def is_retryable(status_code):
+    """Only rate limits, server errors and connection failures (no status code) are worth retrying"""
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+def build_message(from_email, subject, content, recipients, content_type='text/html'):
+    """Build a SendGrid v3 mail/send request body with one personalization per recipient"""
+    personalizations = []
+    for email, name in recipients:
+        to = {'email': email}
+        if name:
+            to['name'] = name
+        personalizations.append({'to': [to]})
+    
+    return {
+        'personalizations': personalizations,
+        'from': {'email': from_email},
+        'subject': subject,
+        'content': [{'type': content_type, 'value': content}],
+    }
+
+
 def format_newsletter_content(subject, content_html):
     """
     Format newsletter content into a nice HTML template
@@ -82,81 +220,41 @@ def format_newsletter_content(subject, content_html):
     # Convert content to HTML if it's in Markdown
     html_content = convert_markdown_to_html(content_html)
     
-    # Email template
-    template = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{subject}</title>
-        <style>
-            body {{
-                font-family: 'Helvetica Neue', Arial, sans-serif;
-                line-height: 1.6;
-                color: #2B2D42;
-                margin: 0;
-                padding: 0;
-                background-color: #EDF2F4;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-                padding: 20px;
-                background-color: #ffffff;
-            }}
-            .header {{
-                text-align: center;
-                padding: 20px 0;
-                border-bottom: 1px solid #8D99AE;
-            }}
-            .content {{
-                padding: 20px 0;
-            }}
-            h1 {{
-                color: #2B2D42;
-                margin-top: 0;
-            }}
-            h2 {{
-                color: #2B2D42;
-                border-bottom: 1px solid #EDF2F4;
-                padding-bottom: 10px;
-            }}
-            a {{
-                color: #EF233C;
-                text-decoration: none;
-            }}
-            a:hover {{
-                text-decoration: underline;
-            }}
-            .footer {{
-                text-align: center;
-                font-size: 12px;
-                color: #8D99AE;
-                padding: 20px 0;
-                border-top: 1px solid #8D99AE;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>{subject}</h1>
-                <p>{datetime.now().strftime('%B %d, %Y')}</p>
-            </div>
-            <div class="content">
-                {html_content}
-            </div>
-            <div class="footer">
-                <p>This newsletter was sent to you because you subscribed to our list.</p>
-                <p>&copy; {datetime.now().year} Newsletter Automation System</p>
-            </div>
-        </div>
-    </body>
-    </html>
+    # The template is compiled once and kept by Jinja's template cache
+    template = app.jinja_env.get_template('email/newsletter.html')
+    return template.render(subject=subject, content_html=html_content, sent_on=datetime.now())
+
+
+def render_newsletter(subject, draft):
     """
+    Return the email HTML for a draft, rendering it only if it changed
     
-    return template
+    Rendered output is cached per process by draft id and updated_at (plus
+    the subject and date shown in the email), so scheduled sends, previews
+    and retries of the same draft reuse one render.
+    
+    Args:
+        subject: Newsletter subject
+        draft: Draft object
+    
+    Returns:
+        str: Formatted HTML content
+    """
+    key = (draft.id, draft.updated_at, subject, date.today())
+    
+    with _render_cache_lock:
+        if key in _render_cache:
+            _render_cache.move_to_end(key)
+            return _render_cache[key]
+    
+    rendered = format_newsletter_content(subject, draft.content)
+    
+    with _render_cache_lock:
+        _render_cache[key] = rendered
+        while len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+    
+    return rendered
 
 
 def convert_markdown_to_html(content):
@@ -169,10 +267,9 @@ def convert_markdown_to_html(content):
     Returns:
         str: HTML content
     """
-    try:
-        import markdown
+    if markdown is not None:
         return markdown.markdown(content)
-    except ImportError:
+    else:
         # Simple fallback for Markdown conversion if the library is not available
         html_content = content
         
@@ -200,7 +297,7 @@ def convert_markdown_to_html(content):
 
 def send_email(to_email, from_email, subject, text_content=None, html_content=None):
     """
-    Send a single email using SendGrid
+    Send a single email using SendGrid (or the configured EMAIL_TRANSPORT)
     
     Args:
         to_email: Recipient email
@@ -214,26 +311,18 @@ def send_email(to_email, from_email, subject, text_content=None, html_content=No
     """
     sendgrid_key = os.environ.get('SENDGRID_API_KEY')
     
-    if not sendgrid_key:
+    if not sendgrid_key and EMAIL_TRANSPORT == 'sendgrid':
         logger.error("SendGrid API key not configured")
         return False
     
-    sg = SendGridAPIClient(sendgrid_key)
-
-    message = Mail(
-        from_email=Email(from_email),
-        to_emails=To(to_email),
-        subject=subject
-    )
-
     if html_content:
-        message.content = Content("text/html", html_content)
-    elif text_content:
-        message.content = Content("text/plain", text_content)
+        message = build_message(from_email, subject, html_content, [(to_email, None)])
+    else:
+        message = build_message(from_email, subject, text_content or '', [(to_email, None)], content_type='text/plain')
 
-    try:
-        sg.send(message)
-        return True
-    except Exception as e:
-        logger.error(f"SendGrid error: {e}")
+    status_code, error, *_ = get_transport()(sendgrid_key, message)
+
+    if error:
+        logger.error(f"SendGrid error: {error}")
         return False
+    return True
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import queue
+import smtplib
+import logging
+import threading
+from datetime import datetime
+from email.message import EmailMessage
+from email.policy import SMTP
+from email.utils import formataddr
+from sendgrid import SendGridAPIClient
+
+logger = logging.getLogger(__name__)
+
+# Transport used for all outgoing email: "sendgrid", "smtp" or "file"
+EMAIL_TRANSPORT = os.environ.get('EMAIL_TRANSPORT', 'sendgrid')
+
+# SendGrid settings
+SENDGRID_API_HOST = os.environ.get('SENDGRID_API_HOST', 'https://api.sendgrid.com')
+SENDGRID_RATE_LIMIT = float(os.environ.get('SENDGRID_RATE_LIMIT', 10))  # Requests per second, per process
+
+# SMTP settings
+SMTP_HOST = os.environ.get('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+SMTP_USERNAME = os.environ.get('SMTP_USERNAME')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', '1') == '1'
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 30))
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', 4))
+
+# File sink: one JSON line per request
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', 'outbox.jsonl')
+
+EMAIL_TRANSPORTS = {}
+
+_sendgrid_clients = {}
+_sendgrid_clients_lock = threading.Lock()
+_rate_lock = threading.Lock()
+_next_request_at = 0.0
+
+_smtp_pool = queue.LifoQueue(maxsize=SMTP_POOL_SIZE)
+_file_lock = threading.Lock()
+
+
+def email_transport(name):
+    """
+    Register a function as an email transport
+    
+    A transport is called as transport(api_key, message) with a SendGrid v3
+    mail/send request body (one personalization per recipient) and returns
+    (status_code, error_message). error_message is None on success; the
+    status code is HTTP-style, None meaning a connection problem, so 429,
+    5xx and None are treated as worth retrying. A transport that sends the
+    personalizations one at a time returns (status_code, error_message,
+    delivered) when it fails partway, delivered being how many leading
+    personalizations went out before the error, so only the rest are
+    retried. Transports must be safe to call from several threads at once.
+    """
+    def decorator(func):
+        EMAIL_TRANSPORTS[name] = func
+        return func
+    return decorator
+
+
+def get_transport(name=None):
+    """Return the transport function registered as `name` (defaults to EMAIL_TRANSPORT)"""
+    name = name or EMAIL_TRANSPORT
+    
+    if name not in EMAIL_TRANSPORTS:
+        raise ValueError(f"Unknown email transport '{name}'")
+    
+    return EMAIL_TRANSPORTS[name]
+
+
+@email_transport('sendgrid')
+def send_via_sendgrid(api_key, message):
+    """Send one mail/send request through the shared SendGrid client once the rate limit allows it"""
+    if not api_key:
+        return 400, "SendGrid API key not configured"
+    
+    client = get_sendgrid_client(api_key)
+    wait_for_rate_limit()
+    
+    try:
+        response = client.send(message)
+    except Exception as e:
+        # python_http_client raises HTTPError subclasses carrying the status code
+        return getattr(e, 'status_code', None), f"{type(e).__name__}: {str(e)}"
+    
+    if 200 <= response.status_code < 300:
+        return response.status_code, None
+    return response.status_code, f"Status code {response.status_code}"
+
+
+def get_sendgrid_client(api_key):
+    """Return the process-wide SendGrid client for an API key"""
+    with _sendgrid_clients_lock:
+        if api_key not in _sendgrid_clients:
+            _sendgrid_clients[api_key] = SendGridAPIClient(api_key, host=SENDGRID_API_HOST)
+        return _sendgrid_clients[api_key]
+
+
+def wait_for_rate_limit(rate=SENDGRID_RATE_LIMIT):
+    """Block until the next SendGrid request slot, spacing requests from all threads 1/rate seconds apart"""
+    global _next_request_at
+    
+    if rate <= 0:
+        return
+    
+    with _rate_lock:
+        now = time.monotonic()
+        slot = max(now, _next_request_at)
+        _next_request_at = slot + 1 / rate
+    
+    time.sleep(max(0.0, slot - now))
+
+
+@email_transport('smtp')
+def send_via_smtp(api_key, message):
+    """
+    Send every personalization of a request as its own message over a pooled SMTP connection
+    
+    The MIME body is serialized once per request and only the To header
+    differs between messages. Connections are kept open between calls (up
+    to SMTP_POOL_SIZE idle ones) and each carries many messages back to
+    back, so the connect, TLS and login handshakes are paid once per
+    connection rather than once per message. A dropped connection is
+    reopened once and the message retried. Recipients the server refuses
+    are logged and skipped. Any other error stops the request and reports
+    how many personalizations were already delivered, so a retry never
+    re-sends to them.
+    """
+    connection = None
+    delivered = 0
+    
+    try:
+        from_email = message['from']['email']
+        body = build_email_body(message)
+        connection = checkout_smtp_connection()
+        
+        for personalization in message['personalizations']:
+            recipients = [to['email'] for to in personalization['to']]
+            to_header = ', '.join(formataddr((to.get('name'), to['email'])) for to in personalization['to'])
+            email_message = f"To: {to_header}\r\n".encode() + body
+            
+            try:
+                connection.sendmail(from_email, recipients, email_message)
+            except smtplib.SMTPRecipientsRefused as e:
+                logger.warning(f"SMTP server refused {', '.join(e.recipients)}")
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # The server closed an idle pooled connection; reconnect and try once more
+                close_smtp_connection(connection)
+                connection = None
+                connection = open_smtp_connection()
+                connection.sendmail(from_email, recipients, email_message)
+            
+            delivered += 1
+        
+        checkin_smtp_connection(connection)
+        return 250, None
+    
+    except smtplib.SMTPResponseException as e:
+        close_smtp_connection(connection)
+        # 4xx replies are transient, 5xx permanent
+        status_code = None if 400 <= e.smtp_code < 500 else 400
+        return status_code, f"SMTP error {e.smtp_code}: {e.smtp_error!r}", delivered
+    except (smtplib.SMTPException, OSError) as e:
+        close_smtp_connection(connection)
+        return None, f"{type(e).__name__}: {str(e)}", delivered
+
+
+def build_email_body(message):
+    """Serialize the headers (except To) and MIME body shared by all recipients of a SendGrid-style request"""
+    email_message = EmailMessage(policy=SMTP)
+    email_message['From'] = formataddr((message['from'].get('name'), message['from']['email']))
+    email_message['Subject'] = message['subject']
+    
+    content = message['content'][0]
+    email_message.set_content(content['value'], subtype='html' if content['type'] == 'text/html' else 'plain')
+    return email_message.as_bytes()
+
+
+def checkout_smtp_connection():
+    """Take an idle connection from the pool, or open a new one"""
+    try:
+        return _smtp_pool.get_nowait()
+    except queue.Empty:
+        return open_smtp_connection()
+
+
+def checkin_smtp_connection(connection):
+    """Return a connection to the pool, closing it if the pool is full"""
+    try:
+        _smtp_pool.put_nowait(connection)
+    except queue.Full:
+        close_smtp_connection(connection)
+
+
+def open_smtp_connection():
+    """Open and authenticate a new SMTP connection"""
+    connection = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    
+    if SMTP_USE_TLS:
+        connection.starttls()
+    if SMTP_USERNAME:
+        connection.login(SMTP_USERNAME, SMTP_PASSWORD)
+    
+    return connection
+
+
+def close_smtp_connection(connection):
+    """Close a connection, ignoring errors from one that is already broken"""
+    if connection is None:
+        return
+    
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
+
+
+@email_transport('file')
+def send_to_file(api_key, message):
+    """Append the request as a JSON line to EMAIL_FILE_PATH instead of sending it"""
+    line = json.dumps({'queued_at': datetime.utcnow().isoformat(), 'message': message})
+    
+    try:
+        with _file_lock:
+            with open(EMAIL_FILE_PATH, 'a') as outbox:
+                outbox.write(line + '\n')
+    except OSError as e:
+        return None, f"Error writing to {EMAIL_FILE_PATH}: {str(e)}"
+    
+    return 202, None
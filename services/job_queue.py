@@ -0,0 +1,254 @@
+import os
+import time
+import random
+import socket
+import signal
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, and_
+from app import db
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+# Worker settings (overridable through the environment)
+POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+RETRY_BASE_DELAY = float(os.environ.get('JOB_RETRY_BASE_DELAY', 30))
+RETRY_MAX_DELAY = float(os.environ.get('JOB_RETRY_MAX_DELAY', 3600))
+LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 1800))
+
+JOB_HANDLERS = {}
+
+
+class JobLockLost(Exception):
+    """Raised by a handler whose job was reclaimed by another worker while it ran"""
+
+
+def job_handler(job_type):
+    """
+    Register a function as the handler for a job type
+    
+    The handler receives the Job and returns a JSON-serialisable result.
+    Raising an exception marks the attempt as failed.
+    """
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+def enqueue_job(job_type, payload=None, user_id=None, max_attempts=3, run_after=None, priority=0, commit=True):
+    """
+    Add a job to the queue
+    
+    Args:
+        job_type: Name of a registered job handler
+        payload: JSON-serialisable job arguments
+        user_id: Owner of the job (optional)
+        max_attempts: Number of attempts before the job is marked as failed
+        run_after: Earliest time the job may run (optional, defaults to now)
+        priority: Runnable jobs with a higher priority are claimed first
+        commit: Commit immediately; pass False to enqueue as part of a larger transaction
+    
+    Returns:
+        Job: The queued job
+    """
+    job = Job(
+        type=job_type,
+        payload=payload or {},
+        user_id=user_id,
+        max_attempts=max_attempts,
+        run_after=run_after or datetime.utcnow(),
+        priority=priority
+    )
+    
+    db.session.add(job)
+    
+    if commit:
+        db.session.commit()
+        logger.info(f"Queued job {job.id} ({job_type})")
+    
+    return job
+
+
+def claim_job(worker_id):
+    """
+    Atomically claim the next runnable job
+    
+    Jobs are claimed by descending priority, then in the order they became
+    runnable.
+    Jobs left running by a worker that died are reclaimed once their lock is
+    older than LOCK_TIMEOUT. The row is selected with FOR UPDATE SKIP LOCKED
+    where the database supports it, and the claim itself is a conditional
+    UPDATE, so two workers can never run the same job.
+    
+    Args:
+        worker_id: Identifier of the claiming worker
+    
+    Returns:
+        Job or None: The claimed job
+    """
+    now = datetime.utcnow()
+    runnable = or_(
+        and_(Job.status == 'queued', Job.run_after <= now),
+        and_(Job.status == 'running', Job.locked_at < now - timedelta(seconds=LOCK_TIMEOUT))
+    )
+    
+    job = (Job.query
+           .filter(runnable)
+           .order_by(Job.priority.desc(), Job.run_after, Job.id)
+           .with_for_update(skip_locked=True)
+           .first())
+    
+    if not job:
+        db.session.commit()
+        return None
+    
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job.id, runnable)
+        .values(
+            status='running',
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=Job.attempts + 1,
+            updated_at=now
+        )
+    ).rowcount
+    db.session.commit()
+    
+    if not claimed:
+        return None
+    
+    db.session.refresh(job)
+    return job
+
+
+def refresh_job_lock(job_id, worker_id):
+    """
+    Extend the lock of a running job so it isn't reclaimed as abandoned
+    
+    Handlers that can run longer than LOCK_TIMEOUT call this as they make
+    progress. The caller commits.
+    
+    Args:
+        job_id: ID of the running job
+        worker_id: Worker that claimed the job
+    
+    Returns:
+        bool: False if the lock had already expired and another worker reclaimed the job
+    """
+    return bool(db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == 'running', Job.locked_by == worker_id)
+        .values(locked_at=datetime.utcnow())
+    ).rowcount)
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome, scheduling a retry on failure
+    
+    Args:
+        job: Job claimed by claim_job
+    
+    Returns:
+        bool: Whether the job succeeded
+    """
+    job_id = job.id
+    handler = JOB_HANDLERS.get(job.type)
+    
+    try:
+        if not handler:
+            raise ValueError(f"No handler registered for job type '{job.type}'")
+        
+        started = time.monotonic()
+        result = handler(job)
+        
+        job = db.session.get(Job, job_id)
+        job.status = 'succeeded'
+        job.result = result
+        job.error_message = None
+        job.locked_by = None
+        db.session.commit()
+        
+        logger.info(f"Job {job_id} ({job.type}) succeeded in {time.monotonic() - started:.2f}s")
+        return True
+    
+    except JobLockLost as e:
+        # Another worker runs the job now; leave its row alone
+        logger.warning(f"Job {job_id} abandoned: {str(e)}")
+        db.session.rollback()
+        return False
+    
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}")
+        db.session.rollback()
+        
+        job = db.session.get(Job, job_id)
+        job.error_message = str(e)
+        job.locked_by = None
+        
+        if handler and job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            job.status = 'queued'
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            logger.info(f"Retrying job {job_id} in {delay:.0f}s (attempt {job.attempts} of {job.max_attempts})")
+        else:
+            job.status = 'failed'
+        
+        db.session.commit()
+        return False
+
+
+def retry_delay(attempts):
+    """Exponential backoff delay in seconds, jittered to spread out retries"""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** (attempts - 1)))
+    return random.uniform(delay / 2, delay)
+
+
+def run_worker(worker_id=None, poll_interval=POLL_INTERVAL, once=False):
+    """
+    Process queued jobs until stopped
+    
+    Must be called inside an application context. SIGTERM and SIGINT stop
+    the worker after the current job finishes.
+    
+    Args:
+        worker_id: Identifier recorded on claimed jobs (optional)
+        poll_interval: Seconds to sleep when the queue is empty
+        once: Stop as soon as the queue is empty
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stopping = []
+    
+    def stop(signum, frame):
+        logger.info(f"Worker {worker_id} stopping after current job")
+        stopping.append(signum)
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    logger.info(f"Worker {worker_id} started with handlers: {', '.join(sorted(JOB_HANDLERS))}")
+    
+    while not stopping:
+        try:
+            job = claim_job(worker_id)
+        except Exception as e:
+            logger.error(f"Error claiming job: {str(e)}")
+            db.session.rollback()
+            job = None
+        
+        if job:
+            run_job(job)
+            continue
+        
+        if once:
+            break
+        
+        time.sleep(poll_interval)
+        
+        # Don't hold a connection open between polls
+        db.session.remove()
+    
+    logger.info(f"Worker {worker_id} stopped")
@@ -0,0 +1,225 @@
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, text
+from app import db
+from models import SchemaMigration, Feed, Article, Draft, Newsletter, Subscriber, Job
+from utils.helpers import get_text_stats
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for the PostgreSQL advisory lock that serializes migrating processes
+MIGRATION_LOCK_ID = 7244016
+
+MIGRATIONS = {}
+
+
+def migration(version, description):
+    """
+    Register a function as a schema migration
+    
+    Migrations run once per database, in version order, each in its own
+    transaction, and are recorded in the schema_migration table. db.create_all()
+    runs first and already creates new tables, columns and indexes on a fresh
+    database, so every migration must be a no-op when its change is already
+    in place; the helpers below check the live schema before changing it.
+    """
+    def decorator(func):
+        if version in MIGRATIONS:
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS[version] = (description, func)
+        return func
+    return decorator
+
+
+def run_migrations():
+    """
+    Apply all pending migrations
+    
+    On PostgreSQL an advisory lock makes processes that start at the same
+    time wait for each other instead of migrating concurrently. The lock is
+    held by the database session that took it, so it is taken and released
+    on a dedicated connection kept for the whole run; the ORM session may
+    use a different pooled connection after each migration's commit.
+    
+    Returns:
+        list: Versions applied by this call
+    """
+    lock_connection = None
+    
+    if db.engine.dialect.name == 'postgresql':
+        lock_connection = db.engine.connect()
+        lock_connection.execute(text("SELECT pg_advisory_lock(:id)"), {'id': MIGRATION_LOCK_ID})
+        # The lock outlives the transaction; don't leave the connection idle in one
+        lock_connection.commit()
+    
+    applied = []
+    
+    try:
+        done = {version for (version,) in db.session.query(SchemaMigration.version)}
+        
+        for version in sorted(set(MIGRATIONS) - done):
+            description, func = MIGRATIONS[version]
+            logger.info(f"Applying migration {version}: {description}")
+            
+            try:
+                func()
+                db.session.add(SchemaMigration(version=version, description=description,
+                                               applied_at=datetime.utcnow()))
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Migration {version} failed: {str(e)}")
+                db.session.rollback()
+                raise
+            
+            applied.append(version)
+    finally:
+        if lock_connection is not None:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:id)"), {'id': MIGRATION_LOCK_ID})
+            lock_connection.close()
+    
+    return applied
+
+
+def add_column(column, backfill=None):
+    """
+    Add a model column to its existing table unless it's already there
+    
+    Args:
+        column: Column object, e.g. Feed.__table__.c.etag
+        backfill: Value to store in the new column for existing rows (optional)
+    """
+    connection = db.session.connection()
+    table = column.table
+    
+    if column.name in {c['name'] for c in inspect(connection).get_columns(table.name)}:
+        return
+    
+    preparer = connection.dialect.identifier_preparer
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.execute(text(
+        f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}"
+    ))
+    
+    if backfill is not None:
+        connection.execute(table.update().values({column.name: backfill}))
+
+
+def index_exists(model, name):
+    """Check whether the database has an index of that name on a model's table"""
+    return name in {index['name'] for index in inspect(db.session.connection()).get_indexes(model.__tablename__)}
+
+
+def create_index(model, name):
+    """
+    Create an index declared in a model's __table_args__ unless it already exists
+    
+    Args:
+        model: Model class
+        name: Name of the index
+    """
+    if index_exists(model, name):
+        return
+    
+    index = next(index for index in model.__table__.indexes if index.name == name)
+    index.create(db.session.connection())
+
+
+def delete_duplicate_articles():
+    """Keep only the oldest article for each (feed_id, url) so a unique index can be built"""
+    keep = (db.session.query(db.func.min(Article.id))
+            .group_by(Article.feed_id, Article.url)
+            .scalar_subquery())
+    
+    deleted = Article.query.filter(Article.id.notin_(keep)).delete(synchronize_session=False)
+    if deleted:
+        logger.info(f"Deleted {deleted} duplicate articles")
+
+
+@migration(1, "Feed fetch state, article summaries and job priorities")
+def add_fetch_and_job_columns():
+    for column in ('etag', 'last_modified', 'content_hash', 'latest_entry_url', 'next_fetch_at', 'fetch_interval'):
+        add_column(Feed.__table__.c[column])
+    add_column(Feed.__table__.c.fetch_failures, backfill=0)
+    
+    add_column(Article.__table__.c.summary)
+    add_column(Job.__table__.c.priority, backfill=0)
+    
+    if not index_exists(Article, 'ix_article_feed_id_url'):
+        delete_duplicate_articles()
+        create_index(Article, 'ix_article_feed_id_url')
+
+
+@migration(2, "Composite indexes for hot query paths")
+def add_query_indexes():
+    create_index(Feed, 'ix_feed_user_id_created_at')
+    create_index(Feed, 'ix_feed_next_fetch_at')
+    create_index(Article, 'ix_article_feed_id_fetched_at')
+    create_index(Article, 'ix_article_fetched_at_id')
+    create_index(Draft, 'ix_draft_user_id_updated_at')
+    create_index(Newsletter, 'ix_newsletter_status_scheduled_for')
+    create_index(Newsletter, 'ix_newsletter_user_id_created_at')
+    create_index(Subscriber, 'ix_subscriber_user_id_is_active_id')
+    create_index(Subscriber, 'ix_subscriber_user_id_email')
+    create_index(Job, 'ix_job_status_run_after')
+    create_index(Job, 'ix_job_user_id_created_at')
+
+
+@migration(3, "Subscriber list index for keyset pagination")
+def add_subscriber_list_index():
+    create_index(Subscriber, 'ix_subscriber_user_id_created_at')
+
+
+@migration(4, "Full-text search index over articles")
+def add_article_search_index():
+    from services.search import create_search_index
+    create_search_index()
+
+
+@migration(5, "Article snippets, word counts and reading times")
+def add_article_text_stats():
+    for column in ('snippet', 'word_count', 'reading_time'):
+        add_column(Article.__table__.c[column])
+    
+    backfill_article_text_stats()
+
+
+def backfill_article_text_stats(batch_size=500):
+    """
+    Compute the list-view fields of stored articles that don't have them yet
+    
+    Commits after every batch so a large archive isn't rewritten in one
+    transaction; an interrupted run carries on where it stopped.
+    """
+    last_id = 0
+    updated = 0
+    
+    while True:
+        rows = (db.session.query(Article.id, Article.content)
+                .filter(Article.id > last_id, Article.word_count.is_(None))
+                .order_by(Article.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+        
+        db.session.bulk_update_mappings(Article, [
+            dict(get_text_stats(content), id=article_id) for article_id, content in rows
+        ])
+        db.session.commit()
+        
+        last_id = rows[-1][0]
+        updated += len(rows)
+    
+    if updated:
+        logger.info(f"Computed snippets for {updated} articles")
+
+
+@migration(6, "Record the tier of stored article summaries")
+def add_article_summary_tier():
+    # Summaries stored before this can't be attributed to a tier and are regenerated on next use
+    add_column(Article.__table__.c.summary_tier)
+
+
+@migration(7, "Record the job that sends each newsletter")
+def add_newsletter_send_job_id():
+    add_column(Newsletter.__table__.c.send_job_id)
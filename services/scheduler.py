@@ -0,0 +1,196 @@
+import os
+import time
+import heapq
+import signal
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_
+from app import db
+from models import Newsletter, Feed
+from services.job_queue import enqueue_job
+from services.tasks import queue_newsletter_send
+
+logger = logging.getLogger(__name__)
+
+# Scheduler settings (overridable through the environment)
+REFRESH_INTERVAL = float(os.environ.get('SCHEDULER_REFRESH_INTERVAL', 30))
+LOOKAHEAD = int(os.environ.get('SCHEDULER_LOOKAHEAD', 3600))
+CLAIM_BATCH_SIZE = int(os.environ.get('SCHEDULER_CLAIM_BATCH_SIZE', 50))
+FEED_BATCH_SIZE = int(os.environ.get('SCHEDULER_FEED_BATCH_SIZE', 100))
+FEED_LEASE = int(os.environ.get('SCHEDULER_FEED_LEASE', 900))
+
+
+def claim_due_newsletters(now=None, limit=CLAIM_BATCH_SIZE):
+    """
+    Atomically claim due scheduled newsletters and queue a send job for each
+    
+    Rows are locked with SELECT ... FOR UPDATE SKIP LOCKED where the
+    database supports it, and each claim is a conditional UPDATE from
+    'scheduled' to 'sending', so several schedulers can share the load
+    without sending a newsletter twice.
+    
+    Args:
+        now: Reference time (optional, defaults to the current UTC time)
+        limit: Maximum number of newsletters to claim
+    
+    Returns:
+        list: IDs of the claimed newsletters
+    """
+    now = now or datetime.utcnow()
+    
+    due = (db.session.query(Newsletter.id, Newsletter.user_id)
+           .filter(Newsletter.status == 'scheduled', Newsletter.scheduled_for <= now)
+           .order_by(Newsletter.scheduled_for)
+           .limit(limit)
+           .with_for_update(skip_locked=True)
+           .all())
+    
+    claimed = []
+    
+    for newsletter_id, user_id in due:
+        if queue_newsletter_send(newsletter_id, user_id, statuses=('scheduled',), commit=False):
+            claimed.append(newsletter_id)
+    
+    db.session.commit()
+    
+    if claimed:
+        logger.info(f"Queued {len(claimed)} scheduled newsletters for sending: {claimed}")
+    
+    return claimed
+
+
+def claim_due_feeds(now=None, limit=FEED_BATCH_SIZE):
+    """
+    Atomically claim feeds that are due for a refresh and queue a fetch job for them
+    
+    Claimed feeds have their next_fetch_at pushed out by FEED_LEASE seconds
+    so no other scheduler picks them up; the fetch itself then sets the
+    real next fetch time from the feed's adaptive interval.
+    
+    Args:
+        now: Reference time (optional, defaults to the current UTC time)
+        limit: Maximum number of feeds to claim
+    
+    Returns:
+        list: IDs of the claimed feeds
+    """
+    now = now or datetime.utcnow()
+    is_due = or_(Feed.next_fetch_at.is_(None), Feed.next_fetch_at <= now)
+    
+    due = (db.session.query(Feed.id)
+           .filter(is_due)
+           .order_by(Feed.next_fetch_at)
+           .limit(limit)
+           .with_for_update(skip_locked=True)
+           .all())
+    
+    claimed = []
+    
+    for (feed_id,) in due:
+        updated = db.session.execute(
+            update(Feed)
+            .where(Feed.id == feed_id, is_due)
+            .values(next_fetch_at=now + timedelta(seconds=FEED_LEASE))
+        ).rowcount
+        
+        if updated:
+            claimed.append(feed_id)
+    
+    if claimed:
+        enqueue_job('fetch_feeds', {'feed_ids': claimed}, max_attempts=1, commit=False)
+    
+    db.session.commit()
+    
+    if claimed:
+        logger.info(f"Queued refresh of {len(claimed)} feeds")
+    
+    return claimed
+
+
+def load_upcoming(now=None, lookahead=LOOKAHEAD):
+    """
+    Build a min-heap of (due_time, kind, id) events due within the lookahead window
+    
+    Events are scheduled newsletters (kind 'newsletter') and feed refreshes
+    (kind 'feed').
+    """
+    now = now or datetime.utcnow()
+    horizon = now + timedelta(seconds=lookahead)
+    
+    upcoming_newsletters = (db.session.query(Newsletter.scheduled_for, Newsletter.id)
+                            .filter(Newsletter.status == 'scheduled',
+                                    Newsletter.scheduled_for <= horizon)
+                            .all())
+    
+    upcoming_feeds = (db.session.query(Feed.next_fetch_at, Feed.id)
+                      .filter(or_(Feed.next_fetch_at.is_(None), Feed.next_fetch_at <= horizon))
+                      .all())
+    
+    heap = [(scheduled_for, 'newsletter', newsletter_id) for scheduled_for, newsletter_id in upcoming_newsletters]
+    heap += [(next_fetch_at or now, 'feed', feed_id) for next_fetch_at, feed_id in upcoming_feeds]
+    heapq.heapify(heap)
+    return heap
+
+
+def run_scheduler(refresh_interval=REFRESH_INTERVAL):
+    """
+    Fire scheduled newsletters and feed refreshes at their due time until stopped
+    
+    Keeps a min-heap of upcoming events, sleeps until the earliest one and
+    then claims everything of that kind that is due. The heap is rebuilt
+    from the database every `refresh_interval` seconds to pick up newly
+    scheduled, cancelled or rescheduled work. Must be called inside an
+    application context.
+    
+    Args:
+        refresh_interval: Seconds between reloads of upcoming newsletters
+    """
+    stopping = []
+    
+    def stop(signum, frame):
+        logger.info("Scheduler stopping")
+        stopping.append(signum)
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    logger.info("Scheduler started")
+    
+    heap = []
+    next_refresh = 0
+    
+    while not stopping:
+        try:
+            if time.monotonic() >= next_refresh:
+                heap = load_upcoming()
+                next_refresh = time.monotonic() + refresh_interval
+            
+            now = datetime.utcnow()
+            
+            if heap and heap[0][0] <= now:
+                due_kinds = set()
+                while heap and heap[0][0] <= now:
+                    due_kinds.add(heapq.heappop(heap)[1])
+                
+                # Keep claiming while full batches come back
+                if 'newsletter' in due_kinds:
+                    while len(claim_due_newsletters(now)) == CLAIM_BATCH_SIZE:
+                        pass
+                if 'feed' in due_kinds:
+                    while len(claim_due_feeds(now)) == FEED_BATCH_SIZE:
+                        pass
+                continue
+            
+            # Don't hold a connection open while sleeping
+            db.session.remove()
+        
+        except Exception as e:
+            logger.error(f"Scheduler error: {str(e)}")
+            db.session.rollback()
+        
+        wait = next_refresh - time.monotonic()
+        if heap:
+            wait = min(wait, (heap[0][0] - datetime.utcnow()).total_seconds())
+        time.sleep(max(0.1, min(wait, refresh_interval)))
+    
+    logger.info("Scheduler stopped")
@@ -1,62 +1,438 @@
+import os
+import re
+import time
+import random
+import hashlib
+import tempfile
 import logging
+import threading
 import feedparser
 import requests
 import trafilatura
-from datetime import datetime
-from bs4 import BeautifulSoup
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from xml.etree import ElementTree
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from html import unescape
+from itertools import chain
+from collections import Counter, deque
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app import db
-from models import Article
+from models import Feed, Article
+from services.user_stats import bump_user_stats
+from utils.helpers import get_text_stats
 
 logger = logging.getLogger(__name__)
 
-def fetch_rss_feed(feed):
-    """Fetch and parse an RSS feed, saving new articles to the database"""
+# Batch fetching limits (overridable through the environment)
+FETCH_TIMEOUT = float(os.environ.get('FEED_FETCH_TIMEOUT', 20))
+FETCH_MAX_WORKERS = int(os.environ.get('FEED_FETCH_WORKERS', 32))
+FETCH_PER_HOST_LIMIT = int(os.environ.get('FEED_FETCH_PER_HOST', 4))
+USER_AGENT = "NewsNexus/1.0 (+feed fetcher)"
+READ_CHUNK_SIZE = 16 * 1024
+
+# Feed bodies that grow past this many bytes are parsed incrementally while downloading
+STREAMING_THRESHOLD = int(os.environ.get('FEED_STREAMING_THRESHOLD', 2 * 1024 * 1024))
+
+# Adaptive refresh intervals, in seconds
+REFRESH_MIN_INTERVAL = int(os.environ.get('FEED_REFRESH_MIN_INTERVAL', 300))
+REFRESH_MAX_INTERVAL = int(os.environ.get('FEED_REFRESH_MAX_INTERVAL', 86400))
+REFRESH_DEFAULT_INTERVAL = int(os.environ.get('FEED_REFRESH_DEFAULT_INTERVAL', 3600))
+REFRESH_TARGET_ARTICLES = 3  # aim for roughly this many new articles per fetch
+REFRESH_DEAD_AFTER = 10  # consecutive failures before a feed is polled at the maximum interval
+
+# The <title> element lives in <head>, so only the start of a page is scanned
+TITLE_SCAN_BYTES = 64 * 1024
+TITLE_PATTERN = re.compile(r'<title[^>]*>(.*?)</title\s*>', re.IGNORECASE | re.DOTALL)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """
+    Return the process-wide pooled HTTP session used for feed downloads
+    
+    Returns:
+        requests.Session: Shared session with a connection pool sized for batch fetches
+    """
+    global _session
+    
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=FETCH_MAX_WORKERS, pool_maxsize=FETCH_MAX_WORKERS)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _session = session
+        return _session
+
+
+def download_url(url, session=None, timeout=FETCH_TIMEOUT, headers=None):
+    """
+    Download a URL, enforcing a total deadline rather than a per-read timeout
+    
+    Args:
+        url: URL to download
+        session: requests.Session to use (optional, defaults to the shared session)
+        timeout: Maximum number of seconds for the whole download
+        headers: Extra request headers (optional)
+    
+    Returns:
+        tuple: (response, body bytes)
+    """
+    session = session or get_http_session()
+    deadline = time.monotonic() + timeout
+    
+    response = session.get(url, headers=headers, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        return response, b"".join(iter_body(response, deadline, timeout))
+    finally:
+        response.close()
+
+
+def iter_body(response, deadline, timeout):
+    """
+    Yield the chunks of a streamed response, raising TimeoutError once the deadline has passed
+    
+    Each read returns whatever has arrived, up to READ_CHUNK_SIZE bytes, and
+    the socket timeout is lowered to the time left before every read, so a
+    server that trickles bytes cannot hold a download past its deadline.
+    """
+    raw = response.raw
+    sock = getattr(getattr(raw, 'connection', None), 'sock', None)
+    # urllib3 < 2.3 has no read1; fall back to small blocking reads
+    read = getattr(raw, 'read1', None) or raw.read
+    
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Download of {response.url} exceeded {timeout}s")
+        
+        if sock is not None:
+            sock.settimeout(remaining)
+        
+        try:
+            chunk = read(READ_CHUNK_SIZE, decode_content=True)
+        except (OSError, ReadTimeoutError):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Download of {response.url} exceeded {timeout}s")
+            raise
+        
+        if not chunk:
+            return
+        yield chunk
+
+
+def download_rss_feed(url, session=None, timeout=FETCH_TIMEOUT, etag=None, last_modified=None,
+                      content_hash=None, latest_entry_url=None):
+    """
+    Download and parse an RSS feed without touching the database
+    
+    Sends a conditional request using the validators from the previous fetch
+    and skips parsing when the server answers 304 or the body is unchanged.
+    Once more than STREAMING_THRESHOLD bytes have been read (whether or not
+    the server sent a Content-Length) the rest of the feed is parsed
+    incrementally and the download stops at the newest entry seen by the
+    previous fetch, so memory and CPU are bounded by the new entries.
+    
+    Args:
+        url: Feed URL
+        session: requests.Session to use (optional)
+        timeout: Maximum number of seconds for the whole download
+        etag: ETag from the previous fetch (optional)
+        last_modified: Last-Modified from the previous fetch (optional)
+        content_hash: Body hash from the previous fetch (optional)
+        latest_entry_url: URL of the newest entry at the previous fetch (optional)
+    
+    Returns:
+        tuple: (entries, validators), entries is None if the feed has not changed
+    """
+    session = session or get_http_session()
+    deadline = time.monotonic() + timeout
+    
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    
+    response = session.get(url, headers=headers, timeout=timeout, stream=True)
     try:
-        # Parse the feed
-        parsed_feed = feedparser.parse(feed.url)
+        response.raise_for_status()
         
-        if not parsed_feed.entries:
-            logger.warning(f"No entries found in feed: {feed.url}")
-            return []
+        if response.status_code == 304:
+            logger.info(f"Feed not modified: {url}")
+            return None, {
+                'etag': etag,
+                'last_modified': last_modified,
+                'content_hash': content_hash,
+                'latest_entry_url': latest_entry_url,
+            }
+        
+        validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        
+        # Buffer up to the threshold; chunked responses have no Content-Length to go by
+        chunks = iter_body(response, deadline, timeout)
+        head = []
+        size = 0
+        for chunk in chunks:
+            head.append(chunk)
+            size += len(chunk)
+            if size >= STREAMING_THRESHOLD:
+                break
+        
+        if size >= STREAMING_THRESHOLD:
+            # The body is not read in full, so there is no hash to compare next time
+            validators['content_hash'] = None
+            entries = stream_feed_entries(chain(head, chunks), stop_at_url=latest_entry_url)
+            logger.info(f"Streamed {len(entries)} new entries from feed: {url}")
+        else:
+            body = b"".join(head)
+            validators['content_hash'] = hashlib.sha256(body).hexdigest()
+            
+            if validators['content_hash'] == content_hash:
+                logger.info(f"Feed content unchanged: {url}")
+                validators['latest_entry_url'] = latest_entry_url
+                return None, validators
+            
+            entries = list(parse_entries(feedparser.parse(body)))
+    finally:
+        response.close()
+    
+    # Early stopping assumes newest-first; don't remember a stop point for oldest-first feeds
+    dates = [entry['published_at'] for entry in entries[:2]]
+    if not entries:
+        validators['latest_entry_url'] = latest_entry_url
+    elif len(dates) == 2 and all(dates) and dates[0] < dates[1]:
+        validators['latest_entry_url'] = None
+    else:
+        validators['latest_entry_url'] = entries[0]['url']
+    
+    return entries, validators
+
+
+def parse_entries(parsed_feed):
+    """Yield entry dicts (title, url, content, published_at) from a feedparser result"""
+    for entry in parsed_feed.entries:
+        url = entry.get('link')
+        if not url:
+            continue
         
-        new_articles = []
+        # Parse publication date
+        published_at = None
+        if entry.get('published_parsed'):
+            published_at = datetime(*entry.published_parsed[:6])
+        elif entry.get('updated_parsed'):
+            published_at = datetime(*entry.updated_parsed[:6])
         
-        for entry in parsed_feed.entries:
-            # Check if article already exists
-            existing = Article.query.filter_by(url=entry.link, feed_id=feed.id).first()
-            if existing:
+        # Get content
+        content = ""
+        if hasattr(entry, 'content'):
+            content = entry.content[0].value
+        elif hasattr(entry, 'summary'):
+            content = entry.summary
+        elif hasattr(entry, 'description'):
+            content = entry.description
+        
+        yield {
+            'title': entry.get('title') or url,
+            'url': url,
+            'content': content,
+            'published_at': published_at,
+        }
+
+
+def stream_feed_entries(chunks, stop_at_url=None):
+    """
+    Parse a feed incrementally, falling back to feedparser if it is not well-formed XML
+    
+    The strict XML parser rejects input feedparser copes with, such as HTML
+    entities like &nbsp;. The chunks are spooled to a temporary file as they
+    are parsed (in memory up to STREAMING_THRESHOLD bytes, on disk beyond
+    that) so that on a parse error the rest can be read and the whole body
+    handed to feedparser.
+    
+    Args:
+        chunks: Iterator of raw document byte chunks
+        stop_at_url: Stop as soon as an entry with this URL is reached (optional)
+    
+    Returns:
+        list: Entry dicts, newest first as they appear in the feed
+    """
+    with tempfile.SpooledTemporaryFile(max_size=STREAMING_THRESHOLD) as spool:
+        def spooled():
+            for chunk in chunks:
+                spool.write(chunk)
+                yield chunk
+        
+        try:
+            return list(iter_feed_entries(spooled(), stop_at_url=stop_at_url))
+        except ElementTree.ParseError as e:
+            logger.info(f"Feed is not well-formed XML ({str(e)}), parsing with feedparser")
+        
+        for chunk in chunks:
+            spool.write(chunk)
+        spool.seek(0)
+        
+        entries = []
+        for entry in parse_entries(feedparser.parse(spool)):
+            if stop_at_url and entry['url'] == stop_at_url:
+                break
+            entries.append(entry)
+        return entries
+
+
+def iter_feed_entries(chunks, stop_at_url=None):
+    """
+    Incrementally parse an RSS or Atom document, yielding entry dicts as they complete
+    
+    Each <item>/<entry> element is detached from the tree once it has been
+    converted, so memory stays flat however large the document is.
+    
+    Args:
+        chunks: Iterable of raw document byte chunks
+        stop_at_url: Stop as soon as an entry with this URL is reached (optional)
+    
+    Yields:
+        dict: Entry with title, url, content and published_at
+    """
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    stack = []
+    
+    for chunk in chunks:
+        parser.feed(chunk)
+        
+        for event, elem in parser.read_events():
+            if event == 'start':
+                stack.append(elem)
                 continue
             
-            # Parse publication date
-            published_at = None
-            if hasattr(entry, 'published_parsed'):
-                published_at = datetime(*entry.published_parsed[:6])
-            elif hasattr(entry, 'updated_parsed'):
-                published_at = datetime(*entry.updated_parsed[:6])
+            stack.pop()
+            if local_name(elem.tag) not in ('item', 'entry'):
+                continue
             
-            # Get content
-            content = ""
-            if hasattr(entry, 'content'):
-                content = entry.content[0].value
-            elif hasattr(entry, 'summary'):
-                content = entry.summary
-            elif hasattr(entry, 'description'):
-                content = entry.description
+            entry = element_to_entry(elem)
             
-            # Create new article
-            new_article = Article(
-                title=entry.title,
-                url=entry.link,
-                content=content,
-                published_at=published_at,
-                feed_id=feed.id
-            )
+            # Free the finished entry
+            if stack:
+                stack[-1].remove(elem)
             
-            db.session.add(new_article)
-            new_articles.append(new_article)
+            if not entry:
+                continue
+            if stop_at_url and entry['url'] == stop_at_url:
+                return
+            yield entry
+    
+    parser.close()
+
+
+def element_to_entry(elem):
+    """Convert an RSS <item> or Atom <entry> element to an entry dict, or None if it has no link"""
+    fields = {}
+    
+    for child in elem:
+        name = local_name(child.tag)
+        
+        if name == 'link':
+            href = child.get('href')
+            if href is None:
+                fields.setdefault('link', (child.text or '').strip())
+            elif child.get('rel', 'alternate') == 'alternate':
+                fields.setdefault('link', href.strip())
+        else:
+            fields.setdefault(name, child)
+    
+    url = fields.get('link')
+    if not url:
+        return None
+    
+    content = ""
+    for name in ('encoded', 'content', 'summary', 'description'):
+        if name in fields:
+            content = element_text(fields[name])
+            break
+    
+    published_at = None
+    for name in ('published', 'pubDate', 'date', 'updated'):
+        if name in fields:
+            published_at = parse_feed_date(element_text(fields[name]))
+            if published_at:
+                break
+    
+    title = element_text(fields['title']).strip() if 'title' in fields else ""
+    
+    return {
+        'title': title or url,
+        'url': url,
+        'content': content,
+        'published_at': published_at,
+    }
+
+
+def local_name(tag):
+    """Strip the XML namespace from an element tag"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def element_text(elem):
+    """Return the text of an element, serialising any inline (e.g. XHTML) children"""
+    if len(elem):
+        for descendant in elem.iter():
+            descendant.tag = local_name(descendant.tag)
+        return (elem.text or "") + "".join(ElementTree.tostring(child, encoding='unicode') for child in elem)
+    return elem.text or ""
+
+
+def parse_feed_date(value):
+    """Parse an RFC 822 or ISO 8601 feed date into a naive UTC datetime, or None"""
+    value = value.strip()
+    if not value:
+        return None
+    
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def update_feed_validators(feed, validators):
+    """Store the HTTP cache validators returned by download_rss_feed on the feed"""
+    feed.etag = validators.get('etag')
+    feed.last_modified = validators.get('last_modified')
+    feed.content_hash = validators.get('content_hash')
+    feed.latest_entry_url = validators.get('latest_entry_url')
+
+
+def fetch_rss_feed(feed, session=None, timeout=FETCH_TIMEOUT):
+    """Fetch and parse an RSS feed, saving new articles to the database"""
+    try:
+        entries, validators = download_rss_feed(
+            feed.url, session=session, timeout=timeout,
+            etag=feed.etag, last_modified=feed.last_modified, content_hash=feed.content_hash,
+            latest_entry_url=feed.latest_entry_url
+        )
+        
+        new_articles = save_rss_entries(feed, entries) if entries is not None else []
         
+        update_feed_validators(feed, validators)
         db.session.commit()
-        logger.info(f"Added {len(new_articles)} new articles from feed: {feed.url}")
         
         return new_articles
         
@@ -65,41 +441,166 @@ def fetch_rss_feed(feed):
         raise
 
 
-def fetch_website_content(feed):
-    """Fetch and parse a regular website, saving article content to the database"""
+def save_rss_entries(feed, entries):
+    """
+    Save the new entries of an already parsed RSS feed to the database
+    
+    Existing URLs are looked up with one query for the whole batch and the
+    remaining rows are bulk inserted, ignoring any that a concurrent fetch
+    stored in the meantime.
+    
+    Args:
+        feed: Feed object
+        entries: List of entry dicts from parse_entries or iter_feed_entries
+    
+    Returns:
+        list: IDs of the newly stored articles
+    """
     try:
-        # Check if article already exists for this URL
-        existing = Article.query.filter_by(url=feed.url, feed_id=feed.id).first()
-        if existing:
-            logger.info(f"Content for {feed.url} already exists, skipping")
+        if not entries:
+            logger.info(f"No new entries found in feed: {feed.url}")
             return []
         
-        # Send a request to the website
-        downloaded = trafilatura.fetch_url(feed.url)
+        rows = []
+        seen_urls = set()
         
-        if not downloaded:
-            logger.warning(f"Could not download content from {feed.url}")
-            return []
+        for entry in entries:
+            if entry['url'] in seen_urls:
+                continue
+            seen_urls.add(entry['url'])
+            rows.append(dict(entry, feed_id=feed.id, **get_text_stats(entry['content'])))
         
-        # Extract main content
-        extracted_text = trafilatura.extract(downloaded)
+        # Drop the entries we already have in one round-trip per chunk
+        existing_urls = get_existing_urls(feed.id, [row['url'] for row in rows])
+        rows = [row for row in rows if row['url'] not in existing_urls]
         
-        if not extracted_text:
-            logger.warning(f"Could not extract content from {feed.url}")
+        new_article_ids = insert_articles(rows)
+        bump_user_stats(feed.user_id, article_count=len(new_article_ids))
+        
+        db.session.commit()
+        logger.info(f"Added {len(new_article_ids)} new articles from feed: {feed.url}")
+        
+        return new_article_ids
+        
+    except Exception as e:
+        logger.error(f"Error saving RSS entries for {feed.url}: {str(e)}")
+        db.session.rollback()
+        raise
+
+
+def get_existing_urls(feed_id, urls, chunk_size=500):
+    """Return the subset of urls already stored for a feed"""
+    existing = set()
+    
+    for i in range(0, len(urls), chunk_size):
+        chunk = urls[i:i + chunk_size]
+        existing.update(
+            url for (url,) in db.session.query(Article.url)
+            .filter(Article.feed_id == feed_id, Article.url.in_(chunk))
+        )
+    
+    return existing
+
+
+def insert_articles(rows):
+    """
+    Bulk insert article rows, skipping rows that violate the (feed_id, url) unique index
+    
+    Uses INSERT ... ON CONFLICT DO NOTHING on PostgreSQL and SQLite, and plain
+    ORM inserts on other databases.
+    
+    Args:
+        rows: List of dicts of Article column values
+    
+    Returns:
+        list: IDs of the inserted articles
+    """
+    if not rows:
+        return []
+    
+    dialect = db.session.get_bind().dialect.name
+    
+    if dialect == 'postgresql':
+        stmt = pg_insert(Article)
+    elif dialect == 'sqlite':
+        stmt = sqlite_insert(Article)
+    else:
+        articles = [Article(**row) for row in rows]
+        db.session.add_all(articles)
+        db.session.flush()
+        return [article.id for article in articles]
+    
+    stmt = stmt.on_conflict_do_nothing().returning(Article.id)
+    return list(db.session.execute(stmt, rows).scalars())
+
+
+def download_website(url, default_title, session=None, timeout=FETCH_TIMEOUT):
+    """
+    Download a website and extract its main text and title without touching the database
+    
+    The page is downloaded once through the pooled session; the same body
+    feeds trafilatura's content extraction and a lightweight <title> scan.
+    Download errors propagate, so a dead site counts as a failed fetch.
+    
+    Returns:
+        tuple: (title, extracted_text), extracted_text is None if nothing could be extracted
+    """
+    response, body = download_url(url, session=session, timeout=timeout)
+    
+    # Extract main content
+    extracted_text = trafilatura.extract(body)
+    
+    if not extracted_text:
+        logger.warning(f"Could not extract content from {url}")
+        return default_title, None
+    
+    html = body[:TITLE_SCAN_BYTES].decode(response.encoding or 'utf-8', errors='replace')
+    title = extract_title(html) or default_title
+    
+    return title, extracted_text
+
+
+def extract_title(html):
+    """Return the text of the first <title> element in an HTML string, or None"""
+    match = TITLE_PATTERN.search(html)
+    if not match:
+        return None
+    
+    title = " ".join(unescape(match.group(1)).split())
+    return title or None
+
+
+def website_already_fetched(feed):
+    """Check whether the content of a website feed is already stored"""
+    return Article.query.filter_by(url=feed.url, feed_id=feed.id).first() is not None
+
+
+def fetch_website_content(feed, session=None, timeout=FETCH_TIMEOUT):
+    """Fetch and parse a regular website, saving article content to the database"""
+    try:
+        # Check if article already exists for this URL
+        if website_already_fetched(feed):
+            logger.info(f"Content for {feed.url} already exists, skipping")
             return []
         
-        # Try to extract title
-        title = feed.name  # Default to feed name
+        title, extracted_text = download_website(feed.url, feed.name, session=session, timeout=timeout)
+        return save_website_content(feed, title, extracted_text)
         
-        try:
-            response = requests.get(feed.url, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                page_title = soup.find('title')
-                if page_title:
-                    title = page_title.text.strip()
-        except Exception as e:
-            logger.error(f"Error extracting title from {feed.url}: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error fetching website content {feed.url}: {str(e)}")
+        raise
+
+
+def save_website_content(feed, title, extracted_text):
+    """
+    Save the extracted content of a website feed to the database
+    
+    Returns:
+        list: IDs of the newly stored articles
+    """
+    try:
+        if not extracted_text:
+            return []
         
         # Create new article
         new_article = Article(
@@ -107,26 +608,202 @@ def fetch_website_content(feed):
             url=feed.url,
             content=extracted_text,
             published_at=datetime.utcnow(),  # Use current time as we don't know when it was published
-            feed_id=feed.id
+            feed_id=feed.id,
+            **get_text_stats(extracted_text)
         )
         
         db.session.add(new_article)
+        bump_user_stats(feed.user_id, article_count=1)
         db.session.commit()
         
         logger.info(f"Added content from website: {feed.url}")
-        return [new_article]
+        return [new_article.id]
         
     except Exception as e:
-        logger.error(f"Error fetching website content {feed.url}: {str(e)}")
+        logger.error(f"Error saving website content {feed.url}: {str(e)}")
+        db.session.rollback()
         raise
 
 
+def fetch_feeds(feeds, max_workers=FETCH_MAX_WORKERS, per_host_limit=FETCH_PER_HOST_LIMIT,
+                timeout=FETCH_TIMEOUT):
+    """
+    Fetch many feeds concurrently, saving new articles to the database
+    
+    Network I/O and parsing run on a bounded thread pool. Feeds are queued
+    per host and only handed to the pool while their host has fewer than
+    `per_host_limit` downloads in flight, so a busy host never ties up
+    threads that feeds on other hosts could use. Worker threads only see
+    plain values read from each feed up front; database writes stay on the
+    calling thread, so the Flask-SQLAlchemy session is never shared.
+    
+    Args:
+        feeds: List of Feed objects
+        max_workers: Size of the download thread pool
+        per_host_limit: Maximum concurrent downloads against a single host
+        timeout: Maximum number of seconds allowed for each feed download
+    
+    Returns:
+        dict: Throughput statistics and per-feed errors
+    """
+    session = get_http_session()
+    
+    def download(feed_type, url, name, validators):
+        if feed_type == 'rss':
+            return download_rss_feed(url, session=session, timeout=timeout, **validators)
+        return download_website(url, name, session=session, timeout=timeout)
+    
+    stats = {
+        'feeds': len(feeds),
+        'succeeded': 0,
+        'failed': 0,
+        'articles': 0,
+        'article_ids': [],
+        'errors': {},
+    }
+    started = time.monotonic()
+    
+    # Skip website feeds whose single page is already stored before spending a download on them
+    waiting = {}
+    for feed in feeds:
+        if feed.type == 'rss' or not website_already_fetched(feed):
+            waiting.setdefault(urlparse(feed.url).netloc.lower(), deque()).append(feed)
+        else:
+            update_fetch_schedule(feed, 0)
+            stats['succeeded'] += 1
+    db.session.commit()
+    
+    workers = max(1, min(max_workers, sum(len(queue) for queue in waiting.values())))
+    running = {}
+    host_running = Counter()
+    
+    def submit_ready(executor):
+        # Round-robin over hosts so one host with many feeds doesn't go first
+        submitted = True
+        while submitted and len(running) < workers:
+            submitted = False
+            for host, queue in waiting.items():
+                if not queue or host_running[host] >= per_host_limit or len(running) >= workers:
+                    continue
+                
+                feed = queue.popleft()
+                future = executor.submit(download, feed.type, feed.url, feed.name, {
+                    'etag': feed.etag,
+                    'last_modified': feed.last_modified,
+                    'content_hash': feed.content_hash,
+                    'latest_entry_url': feed.latest_entry_url,
+                })
+                running[future] = (feed, host)
+                host_running[host] += 1
+                submitted = True
+    
+    def save_result(feed, future):
+        feed_id, feed_url = feed.id, feed.url
+        
+        try:
+            result = future.result()
+            if feed.type == 'rss':
+                entries, validators = result
+                articles = save_rss_entries(feed, entries) if entries is not None else []
+                update_feed_validators(feed, validators)
+            else:
+                articles = save_website_content(feed, *result)
+            
+            feed.last_fetched = datetime.utcnow()
+            update_fetch_schedule(feed, len(articles))
+            db.session.commit()
+            
+            stats['succeeded'] += 1
+            stats['articles'] += len(articles)
+            stats['article_ids'].extend(articles)
+        except Exception as e:
+            # A failed flush leaves the session unusable until it is rolled back
+            db.session.rollback()
+            logger.error(f"Error fetching feed {feed_url}: {str(e)}")
+            stats['failed'] += 1
+            stats['errors'][feed_id] = str(e)
+            
+            # The rollback expired the feed, so load it again before recording the failure
+            feed = db.session.get(Feed, feed_id)
+            if feed:
+                update_fetch_schedule(feed, 0, failed=True)
+                db.session.commit()
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        submit_ready(executor)
+        
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            
+            # Free the hosts and refill the pool before the slower database work
+            finished = []
+            for future in done:
+                feed, host = running.pop(future)
+                host_running[host] -= 1
+                finished.append((feed, future))
+            submit_ready(executor)
+            
+            for feed, future in finished:
+                save_result(feed, future)
+    
+    elapsed = time.monotonic() - started
+    stats['elapsed'] = elapsed
+    stats['feeds_per_second'] = len(feeds) / elapsed if elapsed > 0 else 0.0
+    stats['articles_per_second'] = stats['articles'] / elapsed if elapsed > 0 else 0.0
+    
+    logger.info(
+        f"Fetched {len(feeds)} feeds ({stats['failed']} failed) and {stats['articles']} articles "
+        f"in {elapsed:.2f}s: {stats['feeds_per_second']:.1f} feeds/s, "
+        f"{stats['articles_per_second']:.1f} articles/s"
+    )
+    
+    return stats
+
+
 def get_website_text_content(url):
     """
     This function takes a url and returns the main text content of the website.
     The text content is extracted using trafilatura and easier to understand.
     """
     # Send a request to the website
-    downloaded = trafilatura.fetch_url(url)
+    response, downloaded = download_url(url)
     text = trafilatura.extract(downloaded)
     return text
+
+
+def update_fetch_schedule(feed, new_article_count, failed=False):
+    """
+    Adapt a feed's refresh interval to its publish rate and set its next fetch time
+    
+    Feeds that produce articles are polled more often, quiet feeds back off,
+    and failing feeds back off exponentially until they are treated as dead
+    and polled at the maximum interval. The caller commits.
+    
+    Args:
+        feed: Feed object that was just fetched
+        new_article_count: Number of new articles the fetch produced
+        failed: Whether the fetch failed
+    """
+    interval = feed.fetch_interval or REFRESH_DEFAULT_INTERVAL
+    
+    if failed:
+        feed.fetch_failures = (feed.fetch_failures or 0) + 1
+        if feed.fetch_failures >= REFRESH_DEAD_AFTER:
+            delay = REFRESH_MAX_INTERVAL
+        else:
+            delay = interval * (2 ** feed.fetch_failures)
+    else:
+        feed.fetch_failures = 0
+        if new_article_count:
+            # Estimate the interval that would yield the target number of articles, smoothed
+            estimate = interval * REFRESH_TARGET_ARTICLES / new_article_count
+            interval = (interval + estimate) / 2
+        else:
+            interval *= 1.5
+        interval = int(min(REFRESH_MAX_INTERVAL, max(REFRESH_MIN_INTERVAL, interval)))
+        feed.fetch_interval = interval
+        delay = interval
+    
+    # Spread feeds out so they don't all come due together
+    delay = min(REFRESH_MAX_INTERVAL, delay) * random.uniform(0.9, 1.1)
+    feed.next_fetch_at = datetime.utcnow() + timedelta(seconds=delay)
@@ -0,0 +1,232 @@
+import os
+import re
+import logging
+from sqlalchemy import inspect, text, or_
+from sqlalchemy.orm import defer, joinedload, contains_eager
+from app import db
+from models import Article, Feed
+from utils.helpers import STOP_WORDS
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL text search configuration used for stemming and stop words
+SEARCH_LANGUAGE = os.environ.get('SEARCH_LANGUAGE', 'english')
+
+# Only the start of very long articles is indexed; a tsvector is limited to 1MB
+SEARCH_MAX_CONTENT = 100000
+
+# Title matches count this many times more than content matches
+SEARCH_TITLE_WEIGHT = 10.0
+
+# Queries matching more articles than this rank only the newest matches (the UI says so)
+SEARCH_MAX_CANDIDATES = int(os.environ.get('SEARCH_MAX_CANDIDATES', 1000))
+
+SEARCH_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def create_search_index():
+    """
+    Create the full-text index over article titles and content, unless it exists
+    
+    PostgreSQL gets a stored generated tsvector column (title weighted above
+    content) with a GIN index. SQLite gets an FTS5 table whose content is
+    read from the article table through a view, plus triggers that keep it
+    in step with every insert, update and delete, including the scraper's
+    bulk inserts. Its extra scope column holds user and feed tokens, so a
+    search only walks the searching user's part of the index. Other
+    databases have no index and search falls back to LIKE.
+    """
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    
+    if dialect == 'postgresql':
+        if 'search_vector' not in {column['name'] for column in inspect(connection).get_columns('article')}:
+            connection.execute(text(f"""
+                ALTER TABLE article ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+                    setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector('{SEARCH_LANGUAGE}', left(coalesce(content, ''), {SEARCH_MAX_CONTENT})), 'B')
+                ) STORED
+            """))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_article_search_vector ON article USING gin (search_vector)"
+        ))
+    
+    elif dialect == 'sqlite':
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'article_fts'"
+        )).first()
+        
+        # A feed never changes owner, so the scope written on insert is still right on delete
+        scope = "'user' || feed.user_id || ' feed' || feed.id"
+        
+        connection.execute(text(f"""
+            CREATE VIEW IF NOT EXISTS article_search_source AS
+            SELECT article.id AS id, article.title AS title, article.content AS content, {scope} AS scope
+            FROM article JOIN feed ON feed.id = article.feed_id
+        """))
+        
+        if not exists:
+            connection.execute(text("""
+                CREATE VIRTUAL TABLE article_fts USING fts5(
+                    title, content, scope,
+                    content='article_search_source', content_rowid='id', tokenize='porter unicode61'
+                )
+            """))
+        
+        connection.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS article_fts_insert AFTER INSERT ON article BEGIN
+                INSERT INTO article_fts (rowid, title, content, scope)
+                SELECT new.id, new.title, new.content, {scope} FROM feed WHERE feed.id = new.feed_id;
+            END
+        """))
+        connection.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS article_fts_delete AFTER DELETE ON article BEGIN
+                INSERT INTO article_fts (article_fts, rowid, title, content, scope)
+                SELECT 'delete', old.id, old.title, old.content, {scope} FROM feed WHERE feed.id = old.feed_id;
+            END
+        """))
+        connection.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS article_fts_update AFTER UPDATE OF title, content ON article BEGIN
+                INSERT INTO article_fts (article_fts, rowid, title, content, scope)
+                SELECT 'delete', old.id, old.title, old.content, {scope} FROM feed WHERE feed.id = old.feed_id;
+                INSERT INTO article_fts (rowid, title, content, scope)
+                SELECT new.id, new.title, new.content, {scope} FROM feed WHERE feed.id = new.feed_id;
+            END
+        """))
+        
+        if not exists:
+            # Index the articles stored before the table existed
+            connection.execute(text("INSERT INTO article_fts (article_fts) VALUES ('rebuild')"))
+    
+    else:
+        logger.warning(f"No full-text index for {dialect}; article search will use LIKE")
+
+
+def search_terms(query):
+    """
+    Split search text into lowercased words, leaving out stop words
+    
+    Stop words match nearly every article, so they would only make a search
+    slower. PostgreSQL's text search drops them too, so a query made only of
+    stop words finds nothing on either database.
+    """
+    terms = [term.lower() for term in SEARCH_TERM_PATTERN.findall(query or '')]
+    return [term for term in terms if term not in STOP_WORDS]
+
+
+def search_articles(user_id, query, feed_id=None, unused_only=False, limit=20, offset=0,
+                    max_candidates=SEARCH_MAX_CANDIDATES):
+    """
+    Search a user's articles, best match first
+    
+    Only the newest `max_candidates` matches (after the feed and unused
+    filters) are ranked. Queries made of common words can match a large
+    share of the articles, and ranking all of them would make their cost
+    grow with the size of the archive. Callers are told when the cap was
+    reached, since older matches may then be missing from the results.
+    
+    Args:
+        user_id: ID of the user whose articles are searched
+        query: Search text as typed by the user; all words must match
+        feed_id: Only search this feed (optional)
+        unused_only: Only return articles not yet used in a draft
+        limit: Maximum number of articles to return
+        offset: Number of best matches to skip, for paging through results
+        max_candidates: Number of newest matches ranked
+    
+    Returns:
+        tuple: (articles, has_more, capped) - the matching Article objects in rank
+               order, whether there are more results after them, and whether
+               `max_candidates` matches were found so older ones were not ranked
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False, False
+    
+    dialect = db.session.get_bind().dialect.name
+    params = {'limit': limit + 1, 'offset': offset, 'candidates': max_candidates}
+    unused_filter = "AND NOT coalesce(article.used_in_draft, false)" if unused_only else ""
+    
+    if dialect == 'postgresql':
+        feed_filter = "AND article.feed_id = :feed_id" if feed_id else ""
+        params.update(query=' '.join(terms), config=SEARCH_LANGUAGE, user_id=user_id, feed_id=feed_id)
+        ranked = f"""
+            WITH search_query AS (
+                SELECT websearch_to_tsquery(CAST(:config AS regconfig), :query) AS query
+            ),
+            candidates AS (
+                SELECT article.id, article.search_vector
+                FROM article JOIN feed ON feed.id = article.feed_id, search_query
+                WHERE article.search_vector @@ search_query.query AND feed.user_id = :user_id
+                      {feed_filter} {unused_filter}
+                ORDER BY article.id DESC
+                LIMIT :candidates
+            )
+            SELECT candidates.id, count(*) OVER () AS matched
+            FROM candidates, search_query
+            ORDER BY ts_rank_cd(candidates.search_vector, search_query.query) DESC, candidates.id DESC
+            LIMIT :limit OFFSET :offset
+        """
+    elif dialect == 'sqlite':
+        # Quote every word so FTS5 query syntax typed by the user is matched literally
+        words = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        scope = f'scope : "feed{int(feed_id)}"' if feed_id else f'scope : "user{int(user_id)}"'
+        params.update(query=f"{scope} AND {{title content}} : ({words})", title_weight=SEARCH_TITLE_WEIGHT)
+        # The unused filter needs the article row, so it is joined in before the candidate LIMIT
+        unused_join = "JOIN article ON article.id = article_fts.rowid" if unused_only else ""
+        ranked = f"""
+            SELECT candidates.id, count(*) OVER () AS matched
+            FROM (
+                SELECT article_fts.rowid AS id, bm25(article_fts, :title_weight, 1.0, 0.0) AS score
+                FROM article_fts {unused_join}
+                WHERE article_fts MATCH :query {unused_filter}
+                ORDER BY article_fts.rowid DESC
+                LIMIT :candidates
+            ) AS candidates
+            JOIN article ON article.id = candidates.id
+            JOIN feed ON feed.id = article.feed_id AND feed.user_id = :user_id
+            ORDER BY candidates.score, candidates.id DESC
+            LIMIT :limit OFFSET :offset
+        """
+        params['user_id'] = user_id
+    else:
+        articles, has_more = search_articles_like(user_id, terms, feed_id, unused_only, limit, offset)
+        return articles, has_more, False
+    
+    rows = db.session.execute(text(ranked), params).all()
+    ids = [row.id for row in rows]
+    capped = bool(rows) and rows[0].matched >= max_candidates
+    return load_in_order(ids[:limit]), len(ids) > limit, capped
+
+
+def search_articles_like(user_id, terms, feed_id, unused_only, limit, offset):
+    """Unindexed fallback for search_articles: every term must appear in the title or content, newest first"""
+    query = (Article.query
+             .join(Feed)
+             .options(defer(Article.content), contains_eager(Article.feed))
+             .filter(Feed.user_id == user_id))
+    
+    for term in terms:
+        pattern = f"%{term}%"
+        query = query.filter(or_(Article.title.ilike(pattern), Article.content.ilike(pattern)))
+    if feed_id:
+        query = query.filter(Article.feed_id == feed_id)
+    if unused_only:
+        query = query.filter(Article.used_in_draft == False)
+    
+    articles = query.order_by(Article.fetched_at.desc(), Article.id.desc()).offset(offset).limit(limit + 1).all()
+    return articles[:limit], len(articles) > limit
+
+
+def load_in_order(ids):
+    """Load articles by ID for a result list, keeping the order of `ids` and leaving content unloaded"""
+    if not ids:
+        return []
+    
+    articles = {
+        article.id: article
+        for article in (Article.query
+                        .options(defer(Article.content), joinedload(Article.feed))
+                        .filter(Article.id.in_(ids)))
+    }
+    return [articles[article_id] for article_id in ids if article_id in articles]
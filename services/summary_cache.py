@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from models import SummaryCache
+
+logger = logging.getLogger(__name__)
+
+# Cache settings (overridable through the environment)
+SUMMARY_CACHE_ENABLED = os.environ.get('SUMMARY_CACHE_ENABLED', '1') == '1'
+SUMMARY_CACHE_TTL = int(os.environ.get('SUMMARY_CACHE_TTL', 30 * 86400))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.environ.get('SUMMARY_CACHE_MAX_ENTRIES', 100000))
+SUMMARY_CACHE_PRUNE_INTERVAL = 3600
+
+_last_pruned = 0
+
+
+def summary_cache_key(model, parameters, text):
+    """
+    Build the content-addressed cache key for a summary
+    
+    Args:
+        model: Model identifier, including the backend (e.g. 'api:facebook/bart-large-cnn')
+        parameters: Dict of generation parameters
+        text: The exact (already truncated) model input, as a string or list of token IDs
+    
+    Returns:
+        str: Hex sha256 digest
+    """
+    material = json.dumps([model, parameters, text], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def get_cached_summaries(keys):
+    """
+    Look up cached summaries
+    
+    Read-only: hits are counted when the caller passes the found keys to
+    store_summaries, so a lookup never writes or commits.
+    
+    Args:
+        keys: List of cache keys
+    
+    Returns:
+        dict: Cache key to summary for every key found
+    """
+    if not SUMMARY_CACHE_ENABLED or not keys:
+        return {}
+    
+    try:
+        rows = (db.session.query(SummaryCache.key, SummaryCache.summary)
+                .filter(SummaryCache.key.in_(set(keys)))
+                .all())
+        found = dict(rows)
+        
+        logger.info(f"Summary cache: {len(found)} hits, {len(set(keys)) - len(found)} misses")
+        return found
+    
+    except Exception as e:
+        logger.warning(f"Summary cache lookup failed: {str(e)}")
+        return {}
+
+
+def store_summaries(entries, hits=()):
+    """
+    Store freshly computed summaries and mark cache hits as recently used
+    
+    The writes run in a savepoint of the caller's transaction and are not
+    committed here; the caller commits with the rest of its work, and a
+    failure only rolls back the savepoint. All hits are counted with one
+    UPDATE.
+    
+    Args:
+        entries: List of (key, model, summary, inference_ms) tuples
+        hits: Keys found by get_cached_summaries (optional)
+    """
+    global _last_pruned
+    
+    rows = [
+        {'key': key, 'model': model, 'summary': summary, 'inference_ms': int(inference_ms)}
+        for key, model, summary, inference_ms in entries if summary
+    ]
+    hits = set(hits)
+    
+    if not SUMMARY_CACHE_ENABLED or not (rows or hits):
+        return
+    
+    try:
+        with db.session.begin_nested():
+            if hits:
+                (SummaryCache.query
+                 .filter(SummaryCache.key.in_(hits))
+                 .update({
+                     SummaryCache.hits: SummaryCache.hits + 1,
+                     SummaryCache.last_used_at: datetime.utcnow()
+                 }, synchronize_session=False))
+            
+            if rows:
+                dialect = db.session.get_bind().dialect.name
+                
+                if dialect == 'postgresql':
+                    db.session.execute(pg_insert(SummaryCache).on_conflict_do_nothing(), rows)
+                elif dialect == 'sqlite':
+                    db.session.execute(sqlite_insert(SummaryCache).on_conflict_do_nothing(), rows)
+                else:
+                    existing = {key for (key,) in db.session.query(SummaryCache.key)
+                                .filter(SummaryCache.key.in_([row['key'] for row in rows]))}
+                    db.session.add_all(SummaryCache(**row) for row in rows if row['key'] not in existing)
+    
+    except Exception as e:
+        logger.warning(f"Summary cache store failed: {str(e)}")
+        return
+    
+    if rows and time.monotonic() - _last_pruned > SUMMARY_CACHE_PRUNE_INTERVAL:
+        _last_pruned = time.monotonic()
+        prune_summary_cache()
+
+
+def prune_summary_cache(ttl=SUMMARY_CACHE_TTL, max_entries=SUMMARY_CACHE_MAX_ENTRIES):
+    """
+    Evict summaries unused for `ttl` seconds, then the least recently used beyond `max_entries`
+    
+    Runs in a savepoint and leaves the commit to the caller, like store_summaries.
+    
+    Returns:
+        int: Number of evicted entries
+    """
+    try:
+        with db.session.begin_nested():
+            evicted = (SummaryCache.query
+                       .filter(SummaryCache.last_used_at < datetime.utcnow() - timedelta(seconds=ttl))
+                       .delete(synchronize_session=False))
+            
+            overflow = SummaryCache.query.count() - max_entries
+            if overflow > 0:
+                oldest = (db.session.query(SummaryCache.key)
+                          .order_by(SummaryCache.last_used_at)
+                          .limit(overflow)
+                          .subquery())
+                evicted += (SummaryCache.query
+                            .filter(SummaryCache.key.in_(db.session.query(oldest.c.key)))
+                            .delete(synchronize_session=False))
+        
+        if evicted:
+            logger.info(f"Evicted {evicted} entries from the summary cache")
+        return evicted
+    
+    except Exception as e:
+        logger.warning(f"Summary cache prune failed: {str(e)}")
+        return 0
+
+
+def get_summary_cache_stats():
+    """
+    Return summary cache statistics
+    
+    Every stored entry is one miss that was computed; every lookup that found
+    an entry is a hit that saved that entry's inference time.
+    
+    Returns:
+        dict: entries, hits, misses, hit_rate and saved_seconds
+    """
+    entries, hits, saved_ms = db.session.query(
+        func.count(SummaryCache.key),
+        func.coalesce(func.sum(SummaryCache.hits), 0),
+        func.coalesce(func.sum(SummaryCache.hits * SummaryCache.inference_ms), 0)
+    ).one()
+    
+    lookups = hits + entries
+    
+    return {
+        'enabled': SUMMARY_CACHE_ENABLED,
+        'entries': entries,
+        'hits': hits,
+        'misses': entries,
+        'hit_rate': hits / lookups if lookups else 0.0,
+        'saved_seconds': saved_ms / 1000,
+    }
@@ -0,0 +1,376 @@
+import os
+import logging
+from datetime import datetime
+from sqlalchemy import update, or_, exists
+from app import db
+from models import User, Feed, Article, Draft, Newsletter, Subscriber, DeliveryLog, Job
+from services.job_queue import job_handler, enqueue_job, refresh_job_lock, JobLockLost
+from services.scraper import fetch_feeds
+from services.notion_client import save_to_notion
+from services.ai_generator import generate_newsletter_draft, summarize_articles, SUMMARY_TIER
+from services.email_sender import send_newsletter
+from services.telegram_notifier import send_notification
+from services.user_stats import bump_user_stats
+
+logger = logging.getLogger(__name__)
+
+# Summarize new articles in the background as they are fetched, so drafts only read stored summaries
+PRESUMMARIZE_ARTICLES = os.environ.get('PRESUMMARIZE_ARTICLES') == '1'
+PRESUMMARIZE_BATCH_SIZE = int(os.environ.get('PRESUMMARIZE_BATCH_SIZE', 32))
+PRESUMMARIZE_PRIORITY = -10
+
+# Subscribers loaded per page while sending, which bounds a send's memory use
+SEND_PAGE_SIZE = int(os.environ.get('SEND_PAGE_SIZE', 5000))
+
+
+@job_handler('fetch_feeds')
+def fetch_feeds_job(job):
+    """Fetch the feeds listed in the job payload"""
+    feeds = Feed.query.filter(Feed.id.in_(job.payload.get('feed_ids', []))).all()
+    
+    if not feeds:
+        return {'feeds': 0, 'articles': 0}
+    
+    stats = fetch_feeds(feeds)
+    
+    # Only retry when nothing could be fetched; partial failures are reported in the result
+    if stats['failed'] == stats['feeds']:
+        raise RuntimeError(f"All {stats['feeds']} feeds failed: {'; '.join(stats['errors'].values())}")
+    
+    if PRESUMMARIZE_ARTICLES:
+        article_ids = stats['article_ids']
+        for start in range(0, len(article_ids), PRESUMMARIZE_BATCH_SIZE):
+            enqueue_job('summarize_articles', {'article_ids': article_ids[start:start + PRESUMMARIZE_BATCH_SIZE]},
+                        max_attempts=2, priority=PRESUMMARIZE_PRIORITY, commit=False)
+        db.session.commit()
+    
+    return {
+        'feeds': stats['feeds'],
+        'failed': stats['failed'],
+        'articles': stats['articles'],
+        'elapsed': round(stats['elapsed'], 3),
+        'errors': {str(feed_id): error for feed_id, error in stats['errors'].items()},
+    }
+
+
+@job_handler('summarize_articles')
+def summarize_articles_job(job):
+    """Store summaries for the articles listed in the job payload that don't have one of the default tier yet"""
+    articles = (Article.query
+                .filter(Article.id.in_(job.payload.get('article_ids', [])),
+                        or_(Article.summary_tier.is_(None), Article.summary_tier != SUMMARY_TIER))
+                .all())
+    
+    if not articles:
+        return {'summarized': 0}
+    
+    summaries = summarize_articles(articles)
+    db.session.commit()
+    
+    return {'summarized': sum(1 for summary in summaries if summary), 'articles': len(articles)}
+
+
+@job_handler('generate_draft')
+def generate_draft_job(job):
+    """Generate a draft from the articles listed in the job payload"""
+    user = db.session.get(User, job.user_id)
+    
+    articles = (Article.query
+                .join(Feed)
+                .filter(Article.id.in_(job.payload.get('article_ids', [])), Feed.user_id == user.id)
+                .all())
+    
+    if not articles:
+        raise ValueError('No valid articles found')
+    
+    title, content = generate_newsletter_draft(articles, job.payload.get('summary_tier'))
+    
+    # Mark articles as used
+    for article in articles:
+        article.used_in_draft = True
+    
+    # Create the draft
+    new_draft = Draft(
+        title=title,
+        content=content,
+        user_id=user.id
+    )
+    
+    db.session.add(new_draft)
+    bump_user_stats(user.id, draft_count=1)
+    db.session.commit()
+    
+    result = {'draft_id': new_draft.id}
+    
+    # Save to Notion if API key is set
+    if user.notion_api_key:
+        try:
+            notion_page_id = save_to_notion(new_draft, user.notion_api_key)
+            if notion_page_id:
+                new_draft.notion_page_id = notion_page_id
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Error saving to Notion: {str(e)}")
+            result['notion_error'] = str(e)
+    
+    return result
+
+
+def queue_newsletter_send(newsletter_id, user_id, statuses=('scheduled', 'failed'), commit=True):
+    """
+    Atomically mark a newsletter as sending and queue the job that sends it
+    
+    The newsletter is claimed with a conditional UPDATE that only matches
+    while it has one of `statuses` and none of its send jobs is queued or
+    running, and the claim records the new job as the one that owns the
+    send, so concurrent callers can never queue two sends. Delivery is
+    checkpointed per batch in the delivery log, so the job's retries only
+    send to subscribers who didn't get the newsletter yet.
+    
+    Args:
+        newsletter_id: ID of the newsletter to send
+        user_id: Owner of the newsletter
+        statuses: Newsletter statuses a send may be queued from
+        commit: Commit immediately; pass False to enqueue as part of a larger transaction
+    
+    Returns:
+        Job or None: The queued job, or None if the newsletter couldn't be claimed
+    """
+    send_in_progress = exists().where(Job.id == Newsletter.send_job_id, Job.status.in_(('queued', 'running')))
+    
+    claimed = db.session.execute(
+        update(Newsletter)
+        .where(Newsletter.id == newsletter_id, Newsletter.status.in_(statuses), ~send_in_progress)
+        .values(status='sending')
+    ).rowcount
+    
+    if not claimed:
+        return None
+    
+    job = enqueue_job('send_newsletter', {'newsletter_id': newsletter_id},
+                      user_id=user_id, max_attempts=3, commit=False)
+    db.session.flush()
+    
+    db.session.execute(
+        update(Newsletter)
+        .where(Newsletter.id == newsletter_id)
+        .values(send_job_id=job.id)
+    )
+    
+    if commit:
+        db.session.commit()
+        logger.info(f"Queued job {job.id} to send newsletter {newsletter_id}")
+    
+    return job
+
+
+@job_handler('send_newsletter')
+def send_newsletter_job(job):
+    """Send the newsletter listed in the job payload"""
+    job_id, worker_id = job.id, job.locked_by
+    newsletter_id = job.payload.get('newsletter_id')
+    
+    # Only the job the newsletter was queued with may send it (sends queued before
+    # send_job_id existed adopt it), so a duplicate job never sends in parallel
+    claimed = db.session.execute(
+        update(Newsletter)
+        .where(Newsletter.id == newsletter_id,
+               Newsletter.status.in_(('sending', 'retrying')),
+               or_(Newsletter.send_job_id == job_id, Newsletter.send_job_id.is_(None)))
+        .values(status='sending', send_job_id=job_id)
+    ).rowcount
+    db.session.commit()
+    
+    if not claimed:
+        logger.warning(f"Newsletter {newsletter_id} isn't waiting to be sent by job {job_id}, skipping")
+        return {'newsletter_id': newsletter_id, 'skipped': True}
+    
+    newsletter = db.session.get(Newsletter, newsletter_id)
+    success, error = deliver_newsletter(newsletter, job_id=job_id, worker_id=worker_id)
+    
+    if not success:
+        # The queue retries the job while it has attempts left; show that instead of a final failure
+        if job.attempts < job.max_attempts:
+            newsletter.status = 'retrying'
+            db.session.commit()
+        raise RuntimeError(error)
+    
+    return {'newsletter_id': newsletter.id, 'recipients': newsletter.recipient_count}
+
+
+def deliver_newsletter(newsletter, job_id=None, worker_id=None):
+    """
+    Send a newsletter to its owner's active subscribers and record the outcome
+    
+    Subscribers are streamed in pages of SEND_PAGE_SIZE (id, email, name)
+    rows, so memory use doesn't grow with the list. Every batch is
+    checkpointed in the delivery log as soon as SendGrid accepts or finally
+    rejects it. Subscribers already logged as sent are skipped, so after a
+    failure calling this again only sends to the remaining subscribers.
+    When run by a job, each checkpoint also refreshes the job's lock, and
+    the send stops with JobLockLost if another worker reclaimed the job.
+    
+    Args:
+        newsletter: Newsletter object
+        job_id: ID of the job sending the newsletter (optional)
+        worker_id: Worker running that job (optional)
+    
+    Returns:
+        tuple: (success, error_message)
+    """
+    user = db.session.get(User, newsletter.user_id)
+    
+    active = Subscriber.query.filter_by(user_id=user.id, is_active=True)
+    
+    if not active.first():
+        newsletter.status = 'failed'
+        newsletter.error_message = 'No active subscribers'
+        db.session.commit()
+        return False, 'No active subscribers'
+    
+    # Update status to sending
+    newsletter.status = 'sending'
+    db.session.commit()
+    
+    newsletter_id = newsletter.id
+    content = newsletter.draft.content
+    error = None
+    lock_lost = []
+    
+    def checkpoint(result, batch_subscribers):
+        lock_held = job_id is None or refresh_job_lock(job_id, worker_id)
+        record_deliveries(newsletter_id, result, [subscriber.id for subscriber in batch_subscribers])
+        
+        # Raising stops send_batches from starting more batches
+        if not lock_held:
+            lock_lost.append(result['batch'])
+            raise JobLockLost(f"Job {job_id} was reclaimed while sending newsletter {newsletter_id}")
+    
+    for page in iter_undelivered_subscribers(user.id, newsletter_id):
+        logger.info(f"Sending newsletter {newsletter_id} to {len(page)} subscribers (from ID {page[0].id})")
+        
+        try:
+            # Send the newsletter
+            success, page_error = send_newsletter(
+                newsletter,
+                content,
+                page,
+                user.sendgrid_api_key,
+                on_batch=checkpoint
+            )
+        except Exception as e:
+            logger.error(f"Error sending newsletter: {str(e)}")
+            db.session.rollback()
+            success, page_error = False, str(e)
+        
+        if lock_lost:
+            raise JobLockLost(f"Job {job_id} was reclaimed while sending newsletter {newsletter_id}")
+        
+        # Keep going with later pages; the failed part is picked up by the next attempt
+        if not success:
+            error = error or page_error
+    
+    if error:
+        newsletter.status = 'failed'
+        newsletter.error_message = f"{error} (sending again resumes with the undelivered subscribers)"
+        newsletter.recipient_count = DeliveryLog.query.filter_by(newsletter_id=newsletter_id, status='sent').count()
+        db.session.commit()
+        return False, error
+    
+    newsletter.status = 'sent'
+    newsletter.sent_at = datetime.utcnow()
+    newsletter.error_message = None
+    newsletter.recipient_count = DeliveryLog.query.filter_by(newsletter_id=newsletter.id, status='sent').count()
+    
+    # Update draft status
+    newsletter.draft.status = 'published'
+    
+    bump_user_stats(
+        user.id,
+        sent_count=1,
+        total_recipients=newsletter.recipient_count,
+        total_opens=newsletter.open_count or 0,
+        total_clicks=newsletter.click_count or 0
+    )
+    db.session.commit()
+    
+    # Send notification if configured
+    if user.telegram_chat_id and user.telegram_bot_token:
+        try:
+            message = f"Newsletter '{newsletter.subject}' sent to {newsletter.recipient_count} subscribers"
+            send_notification(user.telegram_bot_token, user.telegram_chat_id, message)
+        except Exception as e:
+            logger.error(f"Error sending Telegram notification: {str(e)}")
+    
+    return True, None
+
+
+def iter_undelivered_subscribers(user_id, newsletter_id, page_size=SEND_PAGE_SIZE):
+    """
+    Yield pages of a user's active subscribers that haven't been sent a newsletter yet
+    
+    Pages are fetched with keyset pagination on the subscriber ID and hold
+    lightweight (id, email, name) rows rather than ORM objects.
+    
+    Args:
+        user_id: Owner of the subscribers
+        newsletter_id: Newsletter being sent
+        page_size: Maximum number of subscribers per page
+    
+    Yields:
+        list: Rows with id, email and name attributes, in ID order
+    """
+    # NOT EXISTS rather than NOT IN, so PostgreSQL can plan an anti-join on the delivery log index
+    already_sent = exists().where(
+        DeliveryLog.newsletter_id == newsletter_id,
+        DeliveryLog.subscriber_id == Subscriber.id,
+        DeliveryLog.status == 'sent'
+    )
+    last_id = 0
+    
+    while True:
+        page = (db.session.query(Subscriber.id, Subscriber.email, Subscriber.name)
+                .filter_by(user_id=user_id, is_active=True)
+                .filter(Subscriber.id > last_id, ~already_sent)
+                .order_by(Subscriber.id)
+                .limit(page_size)
+                .all())
+        
+        if not page:
+            return
+        
+        yield page
+        
+        if len(page) < page_size:
+            return
+        last_id = page[-1].id
+
+
+def record_deliveries(newsletter_id, result, subscriber_ids):
+    """
+    Checkpoint the outcome of one SendGrid batch in the delivery log
+    
+    Earlier log rows of the same subscribers (from a failed attempt) are
+    replaced, and the batch is committed straight away so a crash or retry
+    never sends it again.
+    
+    Args:
+        newsletter_id: ID of the newsletter being sent
+        result: Batch result from send_batches
+        subscriber_ids: IDs of the subscribers in the batch
+    """
+    (DeliveryLog.query
+     .filter(DeliveryLog.newsletter_id == newsletter_id, DeliveryLog.subscriber_id.in_(subscriber_ids))
+     .delete(synchronize_session=False))
+    
+    db.session.bulk_insert_mappings(DeliveryLog, [
+        {
+            'newsletter_id': newsletter_id,
+            'subscriber_id': subscriber_id,
+            'batch': result['batch'],
+            'status': result['status'],
+            'error_message': result['error'],
+        }
+        for subscriber_id in subscriber_ids
+    ])
+    db.session.commit()
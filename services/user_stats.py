@@ -0,0 +1,143 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import UserStats, Feed, Article, Draft, Newsletter
+
+logger = logging.getLogger(__name__)
+
+# Seconds before a stats row is recounted from scratch, correcting any drift from missed increments
+USER_STATS_MAX_AGE = int(os.environ.get('USER_STATS_MAX_AGE', 86400))
+
+STAT_COLUMNS = (
+    'feed_count',
+    'article_count',
+    'draft_count',
+    'newsletter_count',
+    'sent_count',
+    'total_recipients',
+    'total_opens',
+    'total_clicks',
+)
+
+
+def bump_user_stats(user_id, **deltas):
+    """
+    Increment a user's dashboard counters in the current transaction
+    
+    Runs a single UPDATE ... SET column = column + delta, so concurrent
+    writers never overwrite each other's changes. The caller commits, which
+    keeps the counters in step with the rows they describe. Users without a
+    stats row yet are skipped; their row is built by a full recount the
+    first time it is read.
+    
+    Args:
+        user_id: ID of the user
+        **deltas: Amount to add to each counter (negative to subtract)
+    """
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    
+    unknown = set(deltas) - set(STAT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown user stats: {', '.join(sorted(unknown))}")
+    
+    if not deltas:
+        return
+    
+    values = {column: getattr(UserStats, column) + delta for column, delta in deltas.items()}
+    values['updated_at'] = datetime.utcnow()
+    
+    db.session.execute(update(UserStats).where(UserStats.user_id == user_id).values(**values))
+
+
+def count_user_stats(user_id):
+    """
+    Compute a user's dashboard counters from scratch in one aggregate query
+    
+    Args:
+        user_id: ID of the user
+    
+    Returns:
+        dict: Counter name to value
+    """
+    def scalar(query, name):
+        return query.scalar_subquery().label(name)
+    
+    sent = (Newsletter.user_id == user_id, Newsletter.status == 'sent')
+    
+    query = select(
+        scalar(select(func.count(Feed.id)).where(Feed.user_id == user_id), 'feed_count'),
+        scalar(select(func.count(Article.id)).join(Feed, Article.feed_id == Feed.id)
+               .where(Feed.user_id == user_id), 'article_count'),
+        scalar(select(func.count(Draft.id)).where(Draft.user_id == user_id), 'draft_count'),
+        scalar(select(func.count(Newsletter.id)).where(Newsletter.user_id == user_id), 'newsletter_count'),
+        scalar(select(func.count(Newsletter.id)).where(*sent), 'sent_count'),
+        scalar(select(func.coalesce(func.sum(Newsletter.recipient_count), 0)).where(*sent), 'total_recipients'),
+        scalar(select(func.coalesce(func.sum(Newsletter.open_count), 0)).where(*sent), 'total_opens'),
+        scalar(select(func.coalesce(func.sum(Newsletter.click_count), 0)).where(*sent), 'total_clicks'),
+    )
+    
+    return dict(db.session.execute(query).one()._mapping)
+
+
+def refresh_user_stats(user_id):
+    """
+    Recount a user's dashboard counters and store them, creating the row if needed
+    
+    The caller commits.
+    
+    Args:
+        user_id: ID of the user
+    
+    Returns:
+        UserStats: The refreshed row
+    """
+    values = count_user_stats(user_id)
+    
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        stats = UserStats(user_id=user_id)
+        db.session.add(stats)
+    
+    for column, value in values.items():
+        setattr(stats, column, value)
+    stats.refreshed_at = datetime.utcnow()
+    
+    return stats
+
+
+def get_user_stats(user_id, max_age=USER_STATS_MAX_AGE):
+    """
+    Return a user's dashboard counters
+    
+    Normally a primary key lookup. The row is recounted with
+    refresh_user_stats when it doesn't exist yet or was last recounted more
+    than `max_age` seconds ago.
+    
+    Args:
+        user_id: ID of the user
+        max_age: Maximum seconds since the last full recount
+    
+    Returns:
+        UserStats: The user's stats row
+    """
+    stats = db.session.get(UserStats, user_id)
+    
+    if stats is not None and stats.refreshed_at and stats.refreshed_at > datetime.utcnow() - timedelta(seconds=max_age):
+        return stats
+    
+    try:
+        stats = refresh_user_stats(user_id)
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request created the row first
+        db.session.rollback()
+        stats = db.session.get(UserStats, user_id)
+    except Exception as e:
+        logger.error(f"Error refreshing stats for user {user_id}: {str(e)}")
+        db.session.rollback()
+        raise
+    
+    return stats
@@ -0,0 +1,22 @@
+#!/usr/bin/env bash
+# Run the web app together with the job worker and the scheduler.
+#
+# Feed fetches, draft generation and newsletter sends are queued jobs that
+# only run while a worker is up, and scheduled newsletters and feed refreshes
+# are only queued while the scheduler is up. If any of the three processes
+# exits, the others are stopped too so the deployment restarts as a whole
+# instead of serving requests that would never be processed.
+set -u
+
+python worker.py &
+python scheduler.py &
+gunicorn --bind 0.0.0.0:5000 main:app &
+
+trap 'kill $(jobs -p) 2>/dev/null' TERM INT
+
+wait -n
+status=$?
+
+kill $(jobs -p) 2>/dev/null
+wait
+exit $status
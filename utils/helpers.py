@@ -1,7 +1,17 @@
 import re
 from datetime import datetime
+from html import unescape
 import math
 
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Common English words left out of extractive summary scoring and search queries
+STOP_WORDS = frozenset("""
+    a about after all also an and any are as at be been but by can could did do does for from had has have he her
+    his how i if in into is it its just more most my no not of on one or our out over said she so some than that
+    the their them then there these they this to up was we were what when which who will with would you your
+""".split())
+
 def format_date(date_obj, include_time=True):
     """
     Format a datetime object into a readable string
@@ -55,13 +65,65 @@ def get_reading_time(text):
     if not text:
         return 1
         
-    # Average reading speed: 200 words per minute
     word_count = len(re.findall(r'\w+', text))
-    reading_time = math.ceil(word_count / 200)
+    return reading_time_for(word_count)
+
+
+def reading_time_for(word_count):
+    """
+    Calculate reading time in minutes from a word count
+    
+    Args:
+        word_count: Number of words
+    
+    Returns:
+        int: Reading time in minutes
+    """
+    # Average reading speed: 200 words per minute
+    reading_time = math.ceil((word_count or 0) / 200)
     
     return max(1, reading_time)  # Minimum 1 minute
 
 
+def strip_html(text):
+    """
+    Convert text that may contain HTML to plain text
+    
+    Tags are removed, entities unescaped and whitespace collapsed.
+    
+    Args:
+        text: Plain text or HTML
+    
+    Returns:
+        str: Plain text
+    """
+    return " ".join(unescape(TAG_PATTERN.sub(" ", text or "")).split())
+
+
+def get_text_stats(text, snippet_length=300):
+    """
+    Compute the snippet, word count and reading time shown in article lists
+    
+    HTML tags are stripped first, so feed content that comes as HTML gets a
+    readable snippet and isn't over-counted.
+    
+    Args:
+        text: Article content, plain text or HTML
+        snippet_length: Maximum length of the snippet
+    
+    Returns:
+        dict: snippet, word_count and reading_time values for an Article
+    """
+    plain_text = strip_html(text)
+    word_count = len(re.findall(r'\w+', plain_text))
+    
+    return {
+        'snippet': truncate_text(plain_text, snippet_length),
+        'word_count': word_count,
+        'reading_time': reading_time_for(word_count),
+    }
+
+
 def is_valid_url(url):
     """
     Check if a URL is valid
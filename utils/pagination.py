@@ -0,0 +1,106 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+class KeysetPage:
+    """One page of keyset pagination results, with cursors for the neighbouring pages"""
+    
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total  # approximate, or None when unknown
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(values):
+    """Encode the sort key values of a row as an opaque URL-safe cursor"""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """
+    Decode a cursor made by encode_cursor for the given sort columns
+    
+    Returns:
+        tuple or None: The sort key values, or None for a missing or malformed cursor
+    """
+    if not cursor:
+        return None
+    
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(values) != len(columns):
+            return None
+        return tuple(
+            datetime.fromisoformat(value) if column.type.python_type is datetime else value
+            for value, column in zip(values, columns)
+        )
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def keyset_paginate(query, columns, per_page=20, after=None, before=None, total=None):
+    """
+    Return one page of a query, newest first, using keyset (cursor) pagination
+    
+    Rows are ordered by `columns` descending, whose last column must be
+    unique (normally the primary key) so the order is total. Instead of
+    OFFSET, each page continues from the sort key of the last row shown,
+    which an index on the sort columns finds directly, so page 1000 costs
+    the same as page 1 and no COUNT is needed.
+    
+    Args:
+        query: Filtered, unordered query of model objects
+        columns: Sort columns, e.g. (Article.fetched_at, Article.id)
+        per_page: Rows per page
+        after: Cursor of the last row of the previous page (for "next")
+        before: Cursor of the first row of the following page (for "previous")
+        total: Approximate total to show, if the caller knows one cheaply
+    
+    Returns:
+        KeysetPage: The rows and the cursors of the neighbouring pages
+    """
+    key = tuple_(*columns)
+    before_key = decode_cursor(before, columns)
+    after_key = decode_cursor(after, columns)
+    
+    if before_key is not None:
+        # Walk backwards from the cursor, then restore newest-first order
+        rows = (query.filter(key > tuple_(*before_key))
+                .order_by(*[column.asc() for column in columns])
+                .limit(per_page + 1)
+                .all())
+        more_before = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        has_prev, has_next = more_before, True
+    else:
+        if after_key is not None:
+            query = query.filter(key < tuple_(*after_key))
+        
+        rows = (query.order_by(*[column.desc() for column in columns])
+                .limit(per_page + 1)
+                .all())
+        items = rows[:per_page]
+        has_prev, has_next = after_key is not None, len(rows) > per_page
+    
+    def cursor_for(item):
+        return encode_cursor([getattr(item, column.key) for column in columns])
+    
+    return KeysetPage(
+        items,
+        next_cursor=cursor_for(items[-1]) if items and has_next else None,
+        prev_cursor=cursor_for(items[0]) if items and has_prev else None,
+        total=total
+    )
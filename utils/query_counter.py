@@ -0,0 +1,41 @@
+import os
+import logging
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Requests running more SQL statements than this are logged
+QUERY_COUNT_WARN = int(os.environ.get('QUERY_COUNT_WARN', 20))
+
+
+def init_query_counter(app, engine):
+    """
+    Count the SQL statements each request runs
+    
+    The count is returned in an X-Query-Count response header, and requests
+    running more than QUERY_COUNT_WARN statements are logged, so N+1 query
+    patterns show up without a profiler.
+    
+    Args:
+        app: Flask application
+        engine: SQLAlchemy engine to instrument
+    """
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+    
+    @app.before_request
+    def reset_query_count():
+        g.query_count = 0
+    
+    @app.after_request
+    def add_query_count_header(response):
+        query_count = g.get('query_count', 0)
+        response.headers['X-Query-Count'] = str(query_count)
+        
+        if query_count > QUERY_COUNT_WARN:
+            logger.warning(f"{request.method} {request.path} ran {query_count} SQL queries")
+        
+        return response
@@ -0,0 +1,59 @@
+import os
+import signal
+import argparse
+import logging
+from app import app, db
+from services.job_queue import run_worker
+from services.ai_generator import warm_up_summarizer
+import services.tasks  # noqa: F401  registers the job handlers
+
+logger = logging.getLogger(__name__)
+
+
+def run_worker_processes(count):
+    """Fork `count` worker processes and wait for them, forwarding SIGTERM/SIGINT"""
+    children = []
+    
+    for _ in range(count):
+        pid = os.fork()
+        if pid == 0:
+            with app.app_context():
+                # Each child opens its own database connections
+                db.engine.dispose(close=False)
+                run_worker()
+            os._exit(0)
+        children.append(pid)
+    
+    def forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    parser.add_argument('--processes', type=int, default=int(os.environ.get('WORKER_PROCESSES', 1)),
+                        help="number of worker processes sharing one preloaded model")
+    args = parser.parse_args()
+    
+    # Load the summarization model once up front; forked processes share it copy-on-write,
+    # so it is pinned there rather than unloaded (and reloaded privately) when idle
+    if os.environ.get('SUMMARIZER_WARMUP') == '1':
+        try:
+            warm_up_summarizer(run_inference=args.processes == 1, pin=args.processes > 1)
+        except Exception as e:
+            logger.error(f"Summarizer warm-up failed: {str(e)}")
+    
+    if args.processes > 1:
+        run_worker_processes(args.processes)
+    else:
+        with app.app_context():
+            run_worker()